@@ -1,100 +1,107 @@
 """Shared dependencies for API routes."""
 
+import secrets
 from typing import Optional
-from fastapi import Header, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import FastAPI, Header, Request
 
-from app.core.config import settings
-from app.core.database import get_db
+from app.core.config import API_KEY
 from app.core.exceptions import UnauthorizedError
 from app.repositories.chatbox_repository import ChatboxRepository
 from app.repositories.document_repository import DocumentRepository
 from app.repositories.chunk_repository import ChunkRepository
 from app.services.embedding_service import EmbeddingService
+from app.services.batching_embedder import BatchingEmbedder
+from app.services.embedding_batch_poller import EmbeddingBatchPoller
 from app.services.llm_service import LLMService
 from app.services.chunking_service import ChunkingService
 from app.services.ingestion_service import IngestionService
 from app.services.query_service import QueryService
 
 
-# Service singletons (initialized once)
-_embedding_service: Optional[EmbeddingService] = None
-_llm_service: Optional[LLMService] = None
-_chunking_service: Optional[ChunkingService] = None
+# Service singletons (built once at startup, stored on app.state)
+def init_services(app: FastAPI) -> None:
+    """
+    Build all services and store them on app.state.
+    
+    Called from the lifespan startup hook, before any request is served,
+    so accessors never need a lazy-init check or a lock.
+    """
+    embedding_service = EmbeddingService()
+    llm_service = LLMService()
+    chunking_service = ChunkingService()
+    
+    app.state.embedding_service = embedding_service
+    app.state.llm_service = llm_service
+    app.state.chunking_service = chunking_service
+    # Ingests coalesce their embedding calls; queries call the service
+    # directly so they never wait for a batching window
+    app.state.ingestion_service = IngestionService(
+        chunking_service=chunking_service,
+        embedding_service=BatchingEmbedder(embedding_service),
+    )
+    app.state.query_service = QueryService(
+        embedding_service=embedding_service,
+        llm_service=llm_service,
+    )
+    # Started by the lifespan hook once the database is up
+    app.state.embedding_batch_poller = EmbeddingBatchPoller(embedding_service)
 
 
-def get_embedding_service() -> EmbeddingService:
+async def close_services(app: FastAPI) -> None:
+    """Release resources held by the services (called on shutdown)."""
+    await app.state.embedding_batch_poller.close()
+    await app.state.ingestion_service.close()
+    await app.state.embedding_service.close()
+    await app.state.llm_service.close()
+
+
+async def get_embedding_service(request: Request) -> EmbeddingService:
     """Get singleton embedding service."""
-    global _embedding_service
-    if _embedding_service is None:
-        _embedding_service = EmbeddingService()
-    return _embedding_service
+    return request.app.state.embedding_service
 
 
-def get_llm_service() -> LLMService:
+async def get_llm_service(request: Request) -> LLMService:
     """Get singleton LLM service."""
-    global _llm_service
-    if _llm_service is None:
-        _llm_service = LLMService()
-    return _llm_service
+    return request.app.state.llm_service
 
 
-def get_chunking_service() -> ChunkingService:
+async def get_chunking_service(request: Request) -> ChunkingService:
     """Get singleton chunking service."""
-    global _chunking_service
-    if _chunking_service is None:
-        _chunking_service = ChunkingService()
-    return _chunking_service
+    return request.app.state.chunking_service
+
 
+async def get_ingestion_service(request: Request) -> IngestionService:
+    """Get singleton ingestion service."""
+    return request.app.state.ingestion_service
 
-# Repository factories (per-request, depend on DB session)
-def get_chatbox_repo(db: AsyncSession = Depends(get_db)) -> ChatboxRepository:
+
+async def get_query_service(request: Request) -> QueryService:
+    """Get singleton query service."""
+    return request.app.state.query_service
+
+
+# Repository factories (bound to the request's session via context)
+async def get_chatbox_repo() -> ChatboxRepository:
     """Get chatbox repository."""
-    return ChatboxRepository(db)
+    return ChatboxRepository()
 
 
-def get_document_repo(db: AsyncSession = Depends(get_db)) -> DocumentRepository:
+async def get_document_repo() -> DocumentRepository:
     """Get document repository."""
-    return DocumentRepository(db)
+    return DocumentRepository()
 
 
-def get_chunk_repo(db: AsyncSession = Depends(get_db)) -> ChunkRepository:
+async def get_chunk_repo() -> ChunkRepository:
     """Get chunk repository."""
-    return ChunkRepository(db)
-
-
-# Service factories (per-request, depend on repos)
-def get_ingestion_service(
-    document_repo: DocumentRepository = Depends(get_document_repo),
-    chunk_repo: ChunkRepository = Depends(get_chunk_repo),
-    chunking_service: ChunkingService = Depends(get_chunking_service),
-    embedding_service: EmbeddingService = Depends(get_embedding_service),
-) -> IngestionService:
-    """Get ingestion service."""
-    return IngestionService(
-        document_repo=document_repo,
-        chunk_repo=chunk_repo,
-        chunking_service=chunking_service,
-        embedding_service=embedding_service,
-    )
+    return ChunkRepository()
 
 
-def get_query_service(
-    chunk_repo: ChunkRepository = Depends(get_chunk_repo),
-    document_repo: DocumentRepository = Depends(get_document_repo),
-    embedding_service: EmbeddingService = Depends(get_embedding_service),
-    llm_service: LLMService = Depends(get_llm_service),
-) -> QueryService:
-    """Get query service."""
-    return QueryService(
-        chunk_repo=chunk_repo,
-        document_repo=document_repo,
-        embedding_service=embedding_service,
-        llm_service=llm_service,
-    )
+# Auth dependency (MVP - simple API key)
+# Resolved once at import so the per-request check is a flag test and one compare
+_API_KEY_REQUIRED = bool(API_KEY)
+_API_KEY_BYTES: Optional[bytes] = API_KEY.encode() if API_KEY else None
 
 
-# Auth dependency (MVP - simple API key)
 async def verify_api_key(
     x_api_key: Optional[str] = Header(None, alias="X-API-Key")
 ) -> None:
@@ -105,20 +112,25 @@ async def verify_api_key(
     For MVP, simple API key check (if configured).
     """
     # If no API key is configured, allow all requests (dev mode)
-    if not settings.api_key:
+    if not _API_KEY_REQUIRED:
         return
     
-    # Verify API key matches
-    if x_api_key != settings.api_key:
+    # Verify API key matches (constant-time to avoid a timing side channel)
+    if x_api_key is None or not secrets.compare_digest(x_api_key.encode(), _API_KEY_BYTES):
         raise UnauthorizedError("Invalid or missing API key")
 
 
 # Mock organization ID for MVP (later: extract from JWT)
-def get_current_org_id() -> int:
+# Trivial dependencies are async so FastAPI calls them inline instead of
+# dispatching each one to the threadpool.
+async def get_current_org_id() -> int:
     """
     Get current organization ID.
     
-    TODO: Extract from JWT token later.
+    TODO: Extract from JWT token later, as
+    `get_current_org_id(token: str = Depends(get_token))` with `get_token` a
+    plain module-level function so FastAPI's per-request dependency cache
+    parses the token only once per request.
     For MVP, return fixed org_id=1.
     """
     return 1
@@ -2,6 +2,8 @@
 
 from fastapi import APIRouter, Depends, status
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.exceptions import ValidationError
 from app.schemas.chatbox import (
     ChatboxCreate,
@@ -20,6 +22,9 @@ from app.api.dependencies import (
 
 router = APIRouter(prefix="/v1/chatboxes", tags=["chatboxes"])
 
+# List pages keyed by (org_id, limit, offset); cleared on every write
+_list_cache = TTLCache(settings.chatbox_list_cache_seconds)
+
 
 @router.post(
     "",
@@ -53,7 +58,8 @@ async def create_chatbox(
     )
     
     chatbox = await repo.create(chatbox)
-    return ChatboxResponse.from_orm(chatbox)
+    _list_cache.clear()
+    return ChatboxResponse.model_validate(chatbox)
 
 
 @router.get(
@@ -68,13 +74,19 @@ async def list_chatboxes(
     offset: int = 0,
 ) -> ChatboxListResponse:
     """List all chatboxes for the organization."""
-    chatboxes = await repo.list_by_organization(org_id, limit=limit, offset=offset)
-    total = await repo.count_by_organization(org_id)
+    cache_key = (org_id, limit, offset)
+    cached = _list_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    chatboxes, total = await repo.list_with_total(org_id, limit=limit, offset=offset)
     
-    return ChatboxListResponse(
-        chatboxes=[ChatboxResponse.from_orm(cb) for cb in chatboxes],
+    response = ChatboxListResponse(
+        chatboxes=[ChatboxResponse.model_validate(cb) for cb in chatboxes],
         total=total,
     )
+    _list_cache.set(cache_key, response)
+    return response
 
 
 @router.get(
@@ -88,7 +100,7 @@ async def get_chatbox(
 ) -> ChatboxResponse:
     """Get a specific chatbox by ID."""
     chatbox = await repo.get_by_id(chatbox_id)
-    return ChatboxResponse.from_orm(chatbox)
+    return ChatboxResponse.model_validate(chatbox)
 
 
 @router.patch(
@@ -121,4 +133,6 @@ async def update_chatbox(
         )
     
     chatbox = await repo.update(chatbox)
-    return ChatboxResponse.from_orm(chatbox)
+    _list_cache.clear()
+    return ChatboxResponse.model_validate(chatbox)
+
@@ -34,6 +34,8 @@ async def health_check() -> HealthResponse:
         message="Helperly API is running",
     )
 
-@router.get("/health")
-def health() -> dict:
+
+@router.get("/livez")
+async def liveness() -> dict:
+    """Liveness probe: confirms the process is serving, without touching the database."""
     return {"status": "ok"}
@@ -1,8 +1,12 @@
 """Ingestion endpoints."""
 
-from fastapi import APIRouter, Depends, UploadFile, File, Form, status
+import os
 
-from app.core.config import settings
+from fastapi import APIRouter, Depends, Request, UploadFile, File, Form, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings, UPLOAD_MAX_BYTES
+from app.core.database import get_db
 from app.core.exceptions import ValidationError
 from app.schemas.ingest import (
     IngestTextRequest,
@@ -22,6 +26,9 @@ from app.api.dependencies import (
 
 router = APIRouter(prefix="/v1/ingest", tags=["ingestion"])
 
+# Allowance for multipart boundaries and form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
 
 @router.post(
     "/text",
@@ -31,6 +38,7 @@ router = APIRouter(prefix="/v1/ingest", tags=["ingestion"])
 )
 async def ingest_text(
     data: IngestTextRequest,
+    db: AsyncSession = Depends(get_db),
     chatbox_repo: ChatboxRepository = Depends(get_chatbox_repo),
     ingestion_service: IngestionService = Depends(get_ingestion_service),
 ) -> IngestTextResponse:
@@ -38,12 +46,31 @@ async def ingest_text(
     Ingest raw text into a chatbox.
     
     The text will be chunked, embedded, and stored for later retrieval.
+    Pass `texts` instead of `text` to ingest several documents in one batch.
     """
     # Verify chatbox exists
     await chatbox_repo.get_by_id(data.chatbox_id)
     
+    if data.texts is not None:
+        documents, chunks_created = await ingestion_service.ingest_texts_batch(
+            session=db,
+            chatbox_id=data.chatbox_id,
+            texts=data.texts,
+            source_name=data.source_name,
+        )
+        return IngestTextResponse(
+            document_id=documents[0].id,
+            document_ids=[document.id for document in documents],
+            chunks_created=chunks_created,
+            message=(
+                f"Successfully ingested {len(documents)} texts "
+                f"with {chunks_created} chunks"
+            ),
+        )
+    
     # Ingest text
     document, chunks_created = await ingestion_service.ingest_text(
+        session=db,
         chatbox_id=data.chatbox_id,
         text=data.text,
         source_name=data.source_name,
@@ -52,6 +79,7 @@ async def ingest_text(
     return IngestTextResponse(
         document_id=document.id,
         chunks_created=chunks_created,
+        status=document.status.value,
         message=f"Successfully ingested text with {chunks_created} chunks",
     )
 
@@ -64,6 +92,7 @@ async def ingest_text(
 )
 async def ingest_url(
     data: IngestURLRequest,
+    db: AsyncSession = Depends(get_db),
     chatbox_repo: ChatboxRepository = Depends(get_chatbox_repo),
     ingestion_service: IngestionService = Depends(get_ingestion_service),
 ) -> IngestURLResponse:
@@ -78,6 +107,7 @@ async def ingest_url(
     
     # Ingest URL
     document, chunks_created = await ingestion_service.ingest_url(
+        session=db,
         chatbox_id=data.chatbox_id,
         url=str(data.url),
         depth=data.depth,
@@ -87,6 +117,7 @@ async def ingest_url(
         document_id=document.id,
         chunks_created=chunks_created,
         url=str(data.url),
+        status=document.status.value,
         message=f"Successfully ingested URL with {chunks_created} chunks",
     )
 
@@ -98,8 +129,10 @@ async def ingest_url(
     dependencies=[Depends(verify_api_key)],
 )
 async def upload_file(
+    request: Request,
     chatbox_id: int = Form(...),
     file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
     chatbox_repo: ChatboxRepository = Depends(get_chatbox_repo),
     ingestion_service: IngestionService = Depends(get_ingestion_service),
 ) -> UploadResponse:
@@ -108,26 +141,36 @@ async def upload_file(
     
     Supported formats: .txt, .pdf (TODO: add .docx, .xlsx)
     
-    File size limit is configurable (default 7MB).
+    File size limit is configurable (default 7MB). The upload is read in
+    blocks during ingestion, so it is never buffered in memory as a whole.
     """
+    size_error = f"File size exceeds limit ({settings.upload_max_mb}MB)"
+    
+    # Reject obviously oversized bodies before touching the file
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES:
+            raise ValidationError(size_error)
+    
     # Verify chatbox exists
     await chatbox_repo.get_by_id(chatbox_id)
     
-    # Read file content
-    content = await file.read()
-    file_size_mb = len(content) / (1024 * 1024)
-    
-    # Check size limit
-    if file_size_mb > settings.upload_max_mb:
-        raise ValidationError(
-            f"File size ({file_size_mb:.2f}MB) exceeds limit ({settings.upload_max_mb}MB)"
-        )
+    # The multipart parser records the size while spooling the upload, so
+    # there is no need to read the file just to measure it
+    file_size = file.size
+    if file_size is None:
+        file_size = file.file.seek(0, os.SEEK_END)
+        file.file.seek(0)
+    if file_size > UPLOAD_MAX_BYTES:
+        raise ValidationError(size_error)
     
     # Ingest file
     document, chunks_created = await ingestion_service.ingest_file(
+        session=db,
         chatbox_id=chatbox_id,
         filename=file.filename or "untitled",
-        content=content,
+        file=file.file,
+        file_size=file_size,
         mime_type=file.content_type,
     )
     
@@ -135,6 +178,7 @@ async def upload_file(
         document_id=document.id,
         chunks_created=chunks_created,
         filename=file.filename or "untitled",
-        file_size_bytes=len(content),
+        file_size_bytes=file_size,
+        status=document.status.value,
         message=f"Successfully uploaded and ingested file with {chunks_created} chunks",
     )
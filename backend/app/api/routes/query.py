@@ -1,7 +1,9 @@
 """Query endpoint for RAG."""
 
 from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.database import get_db
 from app.schemas.query import QueryRequest, QueryResponse
 from app.services.query_service import QueryService
 from app.repositories.chatbox_repository import ChatboxRepository
@@ -22,6 +24,7 @@ router = APIRouter(prefix="/v1", tags=["query"])
 )
 async def query_chatbox(
     data: QueryRequest,
+    db: AsyncSession = Depends(get_db),
     chatbox_repo: ChatboxRepository = Depends(get_chatbox_repo),
     query_service: QueryService = Depends(get_query_service),
 ) -> QueryResponse:
@@ -43,6 +46,7 @@ async def query_chatbox(
     
     # Process query
     answer, sources = await query_service.query(
+        session=db,
         chatbox=chatbox,
         question=data.question,
         origin=data.origin,
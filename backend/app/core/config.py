@@ -20,10 +20,24 @@ class Settings(BaseSettings):
     # Database
     database_url: Optional[str] = None  # Supabase Postgres URL with asyncpg driver
     db_echo: bool = False
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 5  # seconds to wait for a pooled connection
+    db_pool_recycle: int = 1800  # seconds before a connection is replaced
+    db_pool_pre_ping: bool = False  # SELECT 1 on every checkout; recycle covers stale connections
+    db_use_pgbouncer: bool = False  # transaction-mode PgBouncer: no app-side pool
+    db_health_cache_seconds: float = 2.0  # reuse /health DB check result for this long
     
     # Vector Search Defaults
     vector_min_score_default: float = 0.7
     vector_top_k_default: int = 5
+    vector_use_halfvec: bool = True  # store embeddings as halfvec (FP16, pgvector >= 0.7)
+    vector_iterative_scan: bool = False  # iterative HNSW scans, so the chatbox filter keeps top_k results (pgvector >= 0.8)
+    
+    # Response Caching
+    chatbox_list_cache_seconds: float = 5.0  # per-process TTL for GET /v1/chatboxes pages
+    document_cache_seconds: float = 60.0  # per-process TTL for document names in query sources
+    answer_cache_seconds: float = 3600.0  # per-process TTL for LLM answers to identical question + context
     
     # Upload Config
     upload_max_mb: int = 7
@@ -35,6 +49,10 @@ class Settings(BaseSettings):
     openai_api_key: Optional[str] = None
     openai_embedding_model: str = "text-embedding-3-small"
     openai_chat_model: str = "gpt-4o-mini"
+    embed_batch_size: int = 2048  # inputs per embeddings request (capped at the API's 2048)
+    embed_parallelism: int = 8  # concurrent embeddings requests per process
+    embedding_batch_threshold: int = 500  # novel chunks per document before using the Batch API; 0 disables
+    embedding_batch_poll_seconds: float = 60.0  # how often pending batch jobs are checked
     
     # Chunking
     chunk_size: int = 1000
@@ -47,3 +65,8 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
+
+
+# Derived values, computed once at import time
+UPLOAD_MAX_BYTES: int = settings.upload_max_mb * 1024 * 1024
+API_KEY: Optional[str] = settings.api_key
@@ -1,21 +1,49 @@
 """Database connection and session management."""
 
-from typing import AsyncGenerator
+import asyncio
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Optional
+from uuid import uuid4
+from sqlalchemy import event, func
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import NullPool
 
 from app.core.config import settings
 from app.core.logging_config import get_logger
 
+try:
+    from pgvector.utils import HalfVector, Vector
+except ImportError:
+    HalfVector = Vector = None
+
 
 logger = get_logger(__name__)
 
 Base = declarative_base()
 
+# Server-side timestamp default; columns are naive UTC, so convert explicitly
+# rather than depending on the session's TimeZone
+UTC_NOW = func.timezone("utc", func.now())
+
 # Global engine and session factory (initialized on startup)
 engine = None
 AsyncSessionLocal = None
 
+# Session bound to the current request (set by DBSessionMiddleware)
+db_session_ctx: ContextVar[Optional[AsyncSession]] = ContextVar("db_session", default=None)
+
+# Last health check result as (monotonic time, healthy); probes within the TTL reuse it
+_last_health: tuple[float, bool] = (float("-inf"), False)
+_health_lock = asyncio.Lock()
+
+# Schema holding the pgvector types (e.g. "extensions" on Supabase), looked up once
+_vector_schema: Optional[str] = None
+# asyncpg connections with pgvector's binary codec registered, so COPY can send vectors
+_vector_codec_connections: weakref.WeakSet = weakref.WeakSet()
+
 
 async def init_db() -> None:
     """Initialize database connection."""
@@ -27,14 +55,37 @@ async def init_db() -> None:
     
     logger.info("Initializing database connection")
     
+    if settings.db_use_pgbouncer:
+        # PgBouncer already pools; prepared statements don't survive
+        # transaction-mode connection switching, so disable their caches
+        # and give each statement a unique name so server connections
+        # shared by several clients never see a duplicate
+        pool_options = {
+            "poolclass": NullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            },
+        }
+    else:
+        pool_options = {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_pre_ping": settings.db_pool_pre_ping,
+        }
+    
     engine = create_async_engine(
         settings.database_url,
         echo=settings.db_echo,
-        pool_pre_ping=True,  # Verify connections before using
-        pool_size=5,
-        max_overflow=10,
+        **pool_options,
     )
     
+    if Vector is not None:
+        event.listen(engine.sync_engine, "connect", _on_connect)
+    
     AsyncSessionLocal = async_sessionmaker(
         engine,
         class_=AsyncSession,
@@ -48,7 +99,7 @@ async def init_db() -> None:
             await conn.run_sync(Base.metadata.create_all)
         logger.info("Database tables created/verified")
     except Exception as e:
-        logger.error(f"Failed to create database tables: {e}")
+        logger.error("Failed to create database tables: %s", e)
         raise
 
 
@@ -61,30 +112,115 @@ async def close_db() -> None:
         await engine.dispose()
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """Dependency to get database session."""
+def _on_connect(dbapi_connection, connection_record) -> None:
+    """Register the binary vector codec on each new DBAPI connection."""
+    driver = getattr(dbapi_connection, "driver_connection", None)
+    if hasattr(driver, "set_type_codec"):
+        dbapi_connection.run_async(_register_vector_codec)
+
+
+async def _register_vector_codec(driver) -> None:
+    """
+    Make asyncpg send and receive embeddings in pgvector's binary format.
+    
+    Binary COPY needs this codec. SQLAlchemy's pgvector types still bind the
+    text form, which the encoder converts, so both paths share a connection.
+    Failures only disable COPY for this connection.
+    """
+    global _vector_schema
+    
+    if settings.vector_use_halfvec:
+        type_name, codec = "halfvec", HalfVector
+    else:
+        type_name, codec = "vector", Vector
+    
+    def encode(value):
+        if isinstance(value, str):
+            value = codec.from_text(value)
+        return codec._to_db_binary(value)
+    
+    try:
+        if _vector_schema is None:
+            _vector_schema = await driver.fetchval(
+                "SELECT n.nspname FROM pg_type t"
+                " JOIN pg_namespace n ON n.oid = t.typnamespace"
+                " WHERE t.typname = $1",
+                type_name,
+            )
+            if _vector_schema is None:
+                return
+        await driver.set_type_codec(
+            type_name,
+            schema=_vector_schema,
+            encoder=encode,
+            decoder=codec._from_db_binary,
+            format="binary",
+        )
+    except Exception as e:
+        logger.warning("Binary %s codec unavailable, chunks will use INSERT: %s", type_name, e)
+        return
+    _vector_codec_connections.add(driver)
+
+
+def has_vector_codec(driver) -> bool:
+    """Whether an asyncpg connection can COPY embeddings in binary."""
+    return driver in _vector_codec_connections
+
+
+def new_session() -> Optional[AsyncSession]:
+    """Create a new session, or return None if the database is not configured."""
     if not AsyncSessionLocal:
+        return None
+    return AsyncSessionLocal()
+
+
+def get_current_session() -> AsyncSession:
+    """Get the session bound to the current request."""
+    session = db_session_ctx.get()
+    if session is None:
         raise RuntimeError("Database not initialized")
-    
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+    return session
+
+
+async def get_db() -> AsyncSession:
+    """Dependency to get the request's database session."""
+    return get_current_session()
 
 
 async def check_db_health() -> bool:
-    """Check if database is accessible."""
+    """
+    Check if database is accessible.
+    
+    The result is cached for db_health_cache_seconds, and concurrent probes
+    share a single in-flight SELECT 1, so frequent orchestrator checks don't
+    compete with application traffic for pooled connections.
+    """
+    global _last_health
+    
     if not engine:
         return False
     
+    checked_at, healthy = _last_health
+    if time.monotonic() - checked_at < settings.db_health_cache_seconds:
+        return healthy
+    
+    async with _health_lock:
+        # Another probe may have refreshed the result while we waited
+        checked_at, healthy = _last_health
+        if time.monotonic() - checked_at < settings.db_health_cache_seconds:
+            return healthy
+        
+        healthy = await _ping_db()
+        _last_health = (time.monotonic(), healthy)
+        return healthy
+
+
+async def _ping_db() -> bool:
+    """Run a trivial query against the database."""
     try:
         async with engine.connect() as conn:
             await conn.exec_driver_sql("SELECT 1")
         return True
     except Exception as e:
-        logger.error(f"Database health check failed: {e}")
+        logger.error("Database health check failed: %s", e)
         return False
@@ -1,7 +1,7 @@
 """Global exception handlers for consistent error responses."""
 
 from fastapi import Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
@@ -25,9 +25,14 @@ def create_error_response(
     error_code: str,
     message: str,
     request_id: str | None = None,
-) -> JSONResponse:
-    """Create a standardized error response."""
-    return JSONResponse(
+) -> ORJSONResponse:
+    """
+    Create a standardized error response.
+    
+    Handlers pass the request_id stored on request.state by the middleware;
+    the context variable is only consulted as a fallback.
+    """
+    return ORJSONResponse(
         status_code=status_code,
         content={
             "error": {
@@ -39,29 +44,28 @@ def create_error_response(
     )
 
 
-async def helperly_exception_handler(request: Request, exc: HelperlyException) -> JSONResponse:
+def _request_id(request: Request) -> str | None:
+    """Get the request_id recorded by RequestIDMiddleware, if any."""
+    return getattr(request.state, "request_id", None)
+
+
+async def helperly_exception_handler(request: Request, exc: HelperlyException) -> ORJSONResponse:
     """Handle custom Helperly exceptions."""
     
-    status_map = {
-        "VALIDATION_ERROR": status.HTTP_400_BAD_REQUEST,
-        "NOT_FOUND": status.HTTP_404_NOT_FOUND,
-        "UNAUTHORIZED": status.HTTP_401_UNAUTHORIZED,
-        "FORBIDDEN": status.HTTP_403_FORBIDDEN,
-        "RATE_LIMIT_EXCEEDED": status.HTTP_429_TOO_MANY_REQUESTS,
-        "EXTERNAL_SERVICE_ERROR": status.HTTP_502_BAD_GATEWAY,
-    }
-    
-    status_code = status_map.get(exc.code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # Each exception class carries its own HTTP status
+    status_code = exc.http_status
     
     # Log the exception
     if status_code >= 500:
         logger.exception(
-            f"Server error: {exc.message}",
+            "Server error: %s",
+            exc.message,
             extra={"error_code": exc.code}
         )
     else:
         logger.warning(
-            f"Client error: {exc.message}",
+            "Client error: %s",
+            exc.message,
             extra={"error_code": exc.code}
         )
     
@@ -69,14 +73,16 @@ async def helperly_exception_handler(request: Request, exc: HelperlyException) -
         status_code=status_code,
         error_code=exc.code,
         message=exc.message,
+        request_id=_request_id(request),
     )
 
 
-async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+async def validation_exception_handler(request: Request, exc: RequestValidationError) -> ORJSONResponse:
     """Handle Pydantic validation errors."""
     
     logger.warning(
-        f"Validation error: {exc.errors()}",
+        "Validation error: %s",
+        exc.errors(),
         extra={"path": request.url.path}
     )
     
@@ -84,24 +90,27 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         error_code="VALIDATION_ERROR",
         message=f"Request validation failed: {exc.errors()}",
+        request_id=_request_id(request),
     )
 
 
-async def http_exception_handler(request: Request, exc: StarletteHTTPException) -> JSONResponse:
+async def http_exception_handler(request: Request, exc: StarletteHTTPException) -> ORJSONResponse:
     """Handle Starlette HTTP exceptions."""
     
     return create_error_response(
         status_code=exc.status_code,
         error_code="HTTP_ERROR",
         message=exc.detail,
+        request_id=_request_id(request),
     )
 
 
-async def generic_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def generic_exception_handler(request: Request, exc: Exception) -> ORJSONResponse:
     """Handle any unhandled exceptions."""
     
     logger.exception(
-        f"Unhandled exception: {str(exc)}",
+        "Unhandled exception: %s",
+        exc,
         extra={"path": request.url.path}
     )
     
@@ -109,4 +118,5 @@ async def generic_exception_handler(request: Request, exc: Exception) -> JSONRes
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         error_code="INTERNAL_ERROR",
         message="An internal error occurred. Please try again later.",
+        request_id=_request_id(request),
     )
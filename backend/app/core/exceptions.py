@@ -4,6 +4,8 @@
 class HelperlyException(Exception):
     """Base exception for all Helperly exceptions."""
     
+    http_status: int = 500
+    
     def __init__(self, message: str, code: str = "INTERNAL_ERROR"):
         self.message = message
         self.code = code
@@ -13,6 +15,8 @@ class HelperlyException(Exception):
 class ValidationError(HelperlyException):
     """Raised when input validation fails."""
     
+    http_status = 400
+    
     def __init__(self, message: str):
         super().__init__(message, code="VALIDATION_ERROR")
 
@@ -20,6 +24,8 @@ class ValidationError(HelperlyException):
 class NotFoundError(HelperlyException):
     """Raised when a requested resource is not found."""
     
+    http_status = 404
+    
     def __init__(self, message: str):
         super().__init__(message, code="NOT_FOUND")
 
@@ -27,6 +33,8 @@ class NotFoundError(HelperlyException):
 class UnauthorizedError(HelperlyException):
     """Raised when authentication fails."""
     
+    http_status = 401
+    
     def __init__(self, message: str = "Unauthorized"):
         super().__init__(message, code="UNAUTHORIZED")
 
@@ -34,6 +42,8 @@ class UnauthorizedError(HelperlyException):
 class ForbiddenError(HelperlyException):
     """Raised when user doesn't have permission for an action."""
     
+    http_status = 403
+    
     def __init__(self, message: str = "Forbidden"):
         super().__init__(message, code="FORBIDDEN")
 
@@ -41,6 +51,8 @@ class ForbiddenError(HelperlyException):
 class RateLimitError(HelperlyException):
     """Raised when rate limit is exceeded."""
     
+    http_status = 429
+    
     def __init__(self, message: str = "Rate limit exceeded"):
         super().__init__(message, code="RATE_LIMIT_EXCEEDED")
 
@@ -48,6 +60,8 @@ class RateLimitError(HelperlyException):
 class ExternalServiceError(HelperlyException):
     """Raised when an external service (OpenAI, etc.) fails."""
     
+    http_status = 502
+    
     def __init__(self, message: str, service: str = "external"):
         super().__init__(message, code="EXTERNAL_SERVICE_ERROR")
         self.service = service
@@ -1,9 +1,10 @@
 import logging
 import sys
+import time
 from typing import Any
 from contextvars import ContextVar
-import json
-from datetime import datetime
+
+import orjson
 
 from app.core.config import settings
 
@@ -11,13 +12,27 @@ from app.core.config import settings
 # Context variable to store request_id across async calls
 request_id_ctx: ContextVar[str] = ContextVar("request_id", default="")
 
+# Last formatted second, reused while records keep arriving within it
+_ts_cache: tuple[int, str] = (-1, "")
+
+
+def _format_timestamp(created: float) -> str:
+    """Format a record's epoch time as ISO-8601 UTC, caching the seconds part."""
+    global _ts_cache
+    seconds = int(created)
+    cached_seconds, prefix = _ts_cache
+    if seconds != cached_seconds:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _ts_cache = (seconds, prefix)
+    return f"{prefix}.{int((created - seconds) * 1_000_000):06d}Z"
+
 
 class StructuredFormatter(logging.Formatter):
     """Custom formatter that outputs structured JSON logs."""
     
     def format(self, record: logging.LogRecord) -> str:
         log_data: dict[str, Any] = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": _format_timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -36,7 +51,7 @@ class StructuredFormatter(logging.Formatter):
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
         
-        return json.dumps(log_data)
+        return orjson.dumps(log_data, default=str).decode()
 
 
 def setup_logging() -> None:
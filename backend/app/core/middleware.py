@@ -1,18 +1,31 @@
-"""Middleware for request tracking and logging."""
+"""Middleware for request tracking and logging.
 
+Both middlewares are plain ASGI callables rather than BaseHTTPMiddleware
+subclasses, which avoids an extra task and memory stream per request.
+"""
+
+import logging
 import uuid
 import time
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.database import db_session_ctx, new_session
 from app.core.logging_config import request_id_ctx, get_logger
 
 
 logger = get_logger(__name__)
 
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
+def _get_header(scope: Scope, name: bytes) -> str | None:
+    """Get a request header from the ASGI scope (name must be lowercase)."""
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class RequestIDMiddleware:
     """
     Middleware that:
     - Generates a unique request_id for each request
@@ -21,54 +34,116 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
     - Logs request/response metadata
     """
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         # Generate or extract request ID
-        request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
+        request_id = _get_header(scope, b"x-request-id") or str(uuid.uuid4())
         
-        # Store in context for logging
-        request_id_ctx.set(request_id)
+        # Store in context for logging, and on the request for error responses
+        token = request_id_ctx.set(request_id)
+        scope.setdefault("state", {})["request_id"] = request_id
         
         # Start timer
-        start_time = time.time()
+        start_time = time.monotonic()
+        method = scope["method"]
+        path = scope["path"]
+        log_requests = logger.isEnabledFor(logging.INFO)
         
         # Log incoming request
-        logger.info(
-            f"Incoming request",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "client": request.client.host if request.client else None,
-            }
-        )
+        if log_requests:
+            client = scope.get("client")
+            logger.info(
+                "Incoming request",
+                extra={
+                    "method": method,
+                    "path": path,
+                    "client": client[0] if client else None,
+                }
+            )
+        
+        status_code = 500
+        
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Add request_id to response headers
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
         
         # Process request
         try:
-            response = await call_next(request)
-        except Exception as exc:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception:
             logger.exception(
-                f"Unhandled exception during request",
+                "Unhandled exception during request",
                 extra={
-                    "method": request.method,
-                    "path": request.url.path,
+                    "method": method,
+                    "path": path,
                 }
             )
             raise
+        else:
+            # Log response while request_id is still set in the context
+            if log_requests:
+                duration_ms = (time.monotonic() - start_time) * 1000
+                logger.info(
+                    "Request completed",
+                    extra={
+                        "method": method,
+                        "path": path,
+                        "status_code": status_code,
+                        "duration_ms": round(duration_ms, 2),
+                    }
+                )
+        finally:
+            request_id_ctx.reset(token)
+
+
+class DBSessionMiddleware:
+    """
+    Middleware that:
+    - Opens one database session per request (if the database is configured)
+    - Binds it to a context variable so repositories can read it directly
+    - Commits on success, rolls back on errors, and always closes it
+    
+    The commit happens just before the response headers are sent, so a
+    failed commit still surfaces as an error instead of a 2xx response.
+    """
+    
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Calculate duration
-        duration_ms = (time.time() - start_time) * 1000
-        
-        # Log response
-        logger.info(
-            f"Request completed",
-            extra={
-                "method": request.method,
-                "path": request.url.path,
-                "status_code": response.status_code,
-                "duration_ms": round(duration_ms, 2),
-            }
-        )
+        session = new_session()
+        if session is None:
+            await self.app(scope, receive, send)
+            return
         
-        # Add request_id to response headers
-        response.headers["X-Request-ID"] = request_id
+        async def send_after_commit(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                if message["status"] < 400:
+                    await session.commit()
+                else:
+                    await session.rollback()
+            await send(message)
         
-        return response
+        async with session:
+            token = db_session_ctx.set(session)
+            try:
+                await self.app(scope, receive, send_after_commit)
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                db_session_ctx.reset(token)
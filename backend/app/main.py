@@ -5,15 +5,16 @@ A SaaS platform for creating AI-powered chatboxes with RAG capabilities.
 """
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.core.config import settings
 from app.core.logging_config import setup_logging, get_logger
 from app.core.database import init_db, close_db
-from app.core.middleware import RequestIDMiddleware
+from app.core.middleware import RequestIDMiddleware, DBSessionMiddleware
 from app.core.exception_handlers import (
     helperly_exception_handler,
     validation_exception_handler,
@@ -24,6 +25,7 @@ from app.core.exceptions import HelperlyException
 
 # Import routers
 from app.api.routes import health, chatboxes, ingest, query
+from app.api.dependencies import init_services, close_services
 
 
 # Setup logging
@@ -37,18 +39,22 @@ async def lifespan(app: FastAPI):
     Application lifespan: startup and shutdown events.
     """
     # Startup
-    logger.info(f"Starting {settings.app_name} ({settings.env})")
+    logger.info("Starting %s (%s)", settings.app_name, settings.env)
+    
+    init_services(app)
     
     try:
         await init_db()
         logger.info("Database initialized")
+        app.state.embedding_batch_poller.start()
     except Exception as e:
-        logger.warning(f"Database initialization skipped: {e}")
+        logger.warning("Database initialization skipped: %s", e)
     
     yield
     
     # Shutdown
     logger.info("Shutting down application")
+    await close_services(app)
     await close_db()
 
 
@@ -58,18 +64,22 @@ app = FastAPI(
     description="AI-powered chatbox platform with RAG capabilities",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# Add CORS middleware
+# Add CORS middleware (explicit lists, so preflight answers can be cached)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PATCH", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type", "X-API-Key", "X-Request-ID"],
+    expose_headers=["X-Request-ID"],
+    max_age=600,
 )
 
-# Add custom middleware
+# Add custom middleware (last added runs first)
+app.add_middleware(DBSessionMiddleware)
 app.add_middleware(RequestIDMiddleware)
 
 # Register exception handlers
@@ -86,8 +96,10 @@ app.include_router(query.router)
 
 
 @app.get("/")
-async def root():
+async def root(response: Response):
     """Root endpoint."""
+    # Static payload; let clients and proxies reuse it
+    response.headers["Cache-Control"] = "public, max-age=3600"
     return {
         "message": f"Welcome to {settings.app_name}",
         "version": "1.0.0",
@@ -1,11 +1,25 @@
 """Chatbox (Brain) model."""
 
-from datetime import datetime
+from functools import lru_cache
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import ARRAY
 
-from app.core.database import Base
+from app.core.database import Base, UTC_NOW
+
+
+def normalize_origin(origin: str) -> str:
+    """Lowercase an origin and strip trailing slashes, for origin matching."""
+    # Most origins have no trailing slash; skip the rstrip copy for them
+    if origin.endswith("/"):
+        origin = origin.rstrip("/")
+    return origin.lower()
+
+
+@lru_cache(maxsize=1024)
+def _normalize_domains(domains: tuple[str, ...]) -> frozenset[str]:
+    """Normalize each allowed domain with normalize_origin."""
+    return frozenset(map(normalize_origin, domains))
 
 
 class Chatbox(Base):
@@ -15,6 +29,8 @@ class Chatbox(Base):
     """
     
     __tablename__ = "chatboxes"
+    # Fetch server-generated timestamps via RETURNING instead of a refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=False, index=True)
@@ -31,9 +47,20 @@ class Chatbox(Base):
     # Pro/Enterprise: allowed_domains is required (enforced by validation)
     enforce_allowed_domains = Column(Boolean, default=False, nullable=False)
     
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    updated_at = Column(DateTime, server_default=UTC_NOW, onupdate=UTC_NOW, nullable=False)
     
     # Relationships
-    organization = relationship("Organization", back_populates="chatboxes")
-    documents = relationship("Document", back_populates="chatbox", cascade="all, delete-orphan")
+    organization = relationship("Organization", back_populates="chatboxes", lazy="raise_on_sql")
+    documents = relationship("Document", back_populates="chatbox", cascade="all, delete-orphan", lazy="raise_on_sql")
+    
+    @property
+    def allowed_normalized(self) -> frozenset[str]:
+        """
+        Normalized allowed_domains as a set.
+        
+        Chatbox rows are loaded per request, so the set is memoized by the
+        domain list itself: it is shared across requests and a changed list
+        simply maps to a new entry.
+        """
+        return _normalize_domains(tuple(self.allowed_domains or ()))
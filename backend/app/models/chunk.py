@@ -1,16 +1,24 @@
 """Chunk model with pgvector support."""
 
-from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Text, Index, Identity, LargeBinary
 from sqlalchemy.orm import relationship
 
 try:
-    from pgvector.sqlalchemy import Vector
+    from pgvector.sqlalchemy import HALFVEC, Vector
 except ImportError:
     # Fallback if pgvector not installed (dev mode)
-    Vector = None
+    HALFVEC = Vector = None
 
-from app.core.database import Base
+from app.core.config import settings
+from app.core.database import Base, UTC_NOW
+
+# halfvec stores FP16 (3 KB per 1536-dim row instead of 6 KB), halving table,
+# index and scan bandwidth with negligible loss in retrieval quality.
+# EMBEDDING_DTYPE is the matching wire format of pgvector's binary codec.
+if Vector is not None and settings.vector_use_halfvec:
+    EmbeddingType, EMBEDDING_OPS, EMBEDDING_DTYPE = HALFVEC, "halfvec_ip_ops", ">f2"
+else:
+    EmbeddingType, EMBEDDING_OPS, EMBEDDING_DTYPE = Vector, "vector_ip_ops", ">f4"
 
 
 class Chunk(Base):
@@ -20,10 +28,14 @@ class Chunk(Base):
     """
     
     __tablename__ = "chunks"
+    # Fetch server-generated timestamps via RETURNING instead of a refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
-    id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
-    chatbox_id = Column(Integer, ForeignKey("chatboxes.id"), nullable=False, index=True)
+    # Identity with a per-backend cache of 1000 values, so bulk chunk inserts
+    # don't take a sequence round-trip per row
+    id = Column(BigInteger, Identity(start=1, cache=1000), primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    chatbox_id = Column(Integer, ForeignKey("chatboxes.id"), nullable=False)
     
     # Chunk content
     content = Column(Text, nullable=False)
@@ -31,23 +43,44 @@ class Chunk(Base):
     # Position in document
     chunk_index = Column(Integer, nullable=False)
     
+    # SHA-256 of embedding model + content; lets re-ingested text reuse
+    # embeddings stored by the same model
+    content_sha256 = Column(LargeBinary(32), nullable=True)
+    
     # Vector embedding (1536 dimensions for text-embedding-3-small)
     # TODO: Ensure pgvector extension is enabled in Supabase:
     # CREATE EXTENSION IF NOT EXISTS vector;
-    if Vector is not None:
-        embedding = Column(Vector(1536), nullable=True)
+    if EmbeddingType is not None:
+        embedding = Column(EmbeddingType(1536), nullable=True)
     else:
         # Fallback for development without pgvector
         embedding = Column(Text, nullable=True)  # Store as JSON string
     
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
     
     # Relationships
-    document = relationship("Document", back_populates="chunks")
+    document = relationship("Document", back_populates="chunks", lazy="raise_on_sql")
     
-    # Index for efficient vector similarity search
-    # TODO: Create HNSW index for better performance:
-    # CREATE INDEX ON chunks USING hnsw (embedding vector_cosine_ops);
     __table_args__ = (
-        Index("idx_chunks_chatbox_id", "chatbox_id"),
+        # Leads with chatbox_id, so it also serves chatbox-only lookups
+        Index("idx_chunks_chatbox_document", "chatbox_id", "document_id"),
+        # Serves document_id lookups/deletes and ordered reads by position;
+        # content is not INCLUDEd since chunks can exceed the btree row limit
+        Index("idx_chunks_doc_chunkidx", "document_id", "chunk_index"),
+        Index("idx_chunks_chatbox_sha256", "chatbox_id", "content_sha256"),
     )
+    
+    # HNSW index for approximate nearest-neighbour search (needs pgvector >= 0.5).
+    # create_all only builds it for new tables; on existing databases run:
+    # CREATE INDEX CONCURRENTLY chunks_embedding_hnsw ON chunks
+    #     USING hnsw (embedding halfvec_ip_ops) WITH (m = 16, ef_construction = 100);
+    if EmbeddingType is not None:
+        __table_args__ += (
+            Index(
+                "chunks_embedding_hnsw",
+                "embedding",
+                postgresql_using="hnsw",
+                postgresql_ops={"embedding": EMBEDDING_OPS},
+                postgresql_with={"m": 16, "ef_construction": 100},
+            ),
+        )
@@ -1,10 +1,9 @@
 """Document model."""
 
-from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index, Enum as SQLEnum
 import enum
 
-from app.core.database import Base
+from app.core.database import Base, UTC_NOW
 from sqlalchemy.orm import relationship
 
 
@@ -15,6 +14,13 @@ class DocumentType(str, enum.Enum):
     FILE = "file"
 
 
+class DocumentStatus(str, enum.Enum):
+    """Embedding state of a document's chunks."""
+    READY = "ready"
+    PENDING = "pending"  # embeddings are being computed by an OpenAI batch job
+    FAILED = "failed"
+
+
 class Document(Base):
     """
     Document represents an ingested piece of content.
@@ -22,6 +28,8 @@ class Document(Base):
     """
     
     __tablename__ = "documents"
+    # Fetch server-generated timestamps via RETURNING instead of a refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     chatbox_id = Column(Integer, ForeignKey("chatboxes.id"), nullable=False, index=True)
@@ -38,9 +46,23 @@ class Document(Base):
     file_size_bytes = Column(Integer, nullable=True)
     mime_type = Column(String(100), nullable=True)
     
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Embedding state (large ingests are embedded asynchronously)
+    status = Column(SQLEnum(DocumentStatus), nullable=False, default=DocumentStatus.READY)
+    embedding_batch_id = Column(String(100), nullable=True)
+    embedding_checked_at = Column(DateTime, nullable=True)  # last batch status check
+    
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    updated_at = Column(DateTime, server_default=UTC_NOW, onupdate=UTC_NOW, nullable=False)
     
     # Relationships
-    chatbox = relationship("Chatbox", back_populates="documents")
-    chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan")
+    chatbox = relationship("Chatbox", back_populates="documents", lazy="raise_on_sql")
+    chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan", lazy="raise_on_sql")
+    
+    __table_args__ = (
+        # Small partial index for EmbeddingBatchPoller's least-recently-checked scan
+        Index(
+            "idx_documents_pending_checked",
+            "embedding_checked_at",
+            postgresql_where=(status == DocumentStatus.PENDING),
+        ),
+    )
@@ -1,10 +1,9 @@
 """Organization (Tenant) model."""
 
-from datetime import datetime
 from sqlalchemy import Column, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 
-from app.core.database import Base
+from app.core.database import Base, UTC_NOW
 
 
 class Organization(Base):
@@ -14,6 +13,8 @@ class Organization(Base):
     """
     
     __tablename__ = "organizations"
+    # Fetch server-generated timestamps via RETURNING instead of a refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
@@ -24,8 +25,8 @@ class Organization(Base):
     # SaaS plan: free, starter, pro, enterprise
     plan = Column(String(50), default="free", nullable=False)
     
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, server_default=UTC_NOW, nullable=False)
+    updated_at = Column(DateTime, server_default=UTC_NOW, onupdate=UTC_NOW, nullable=False)
     
     # Relationships
-    chatboxes = relationship("Chatbox", back_populates="organization", cascade="all, delete-orphan")
+    chatboxes = relationship("Chatbox", back_populates="organization", cascade="all, delete-orphan", lazy="raise_on_sql")
@@ -1,24 +1,26 @@
 """Repository for Chatbox operations."""
 
 from typing import Optional
-from sqlalchemy import select
+from sqlalchemy import delete, select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.database import get_current_session
 from app.models.chatbox import Chatbox
+from app.models.chunk import Chunk
+from app.models.document import Document
 from app.core.exceptions import NotFoundError
 
 
 class ChatboxRepository:
     """Handles database operations for Chatbox."""
     
-    def __init__(self, session: AsyncSession):
-        self.session = session
+    def __init__(self, session: Optional[AsyncSession] = None):
+        self.session = session or get_current_session()
     
     async def create(self, chatbox: Chatbox) -> Chatbox:
         """Create a new chatbox."""
         self.session.add(chatbox)
         await self.session.commit()
-        await self.session.refresh(chatbox)
         return chatbox
     
     async def get_by_id(self, chatbox_id: int) -> Chatbox:
@@ -45,14 +47,38 @@ class ChatboxRepository:
         result = await self.session.execute(
             select(Chatbox)
             .where(Chatbox.organization_id == org_id)
+            .order_by(Chatbox.id)
             .limit(limit)
             .offset(offset)
         )
         return list(result.scalars().all())
     
+    async def list_with_total(
+        self, org_id: int, limit: int = 100, offset: int = 0
+    ) -> tuple[list[Chatbox], int]:
+        """
+        List chatboxes for an organization together with the total count.
+        
+        Uses a window count so rows and total come back in one round-trip.
+        """
+        result = await self.session.execute(
+            select(Chatbox, func.count().over().label("total"))
+            .where(Chatbox.organization_id == org_id)
+            .order_by(Chatbox.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        rows = result.all()
+        
+        if not rows:
+            # Page past the end: the window count has no row to ride on
+            total = await self.count_by_organization(org_id) if offset else 0
+            return [], total
+        
+        return [row.Chatbox for row in rows], rows[0].total
+    
     async def count_by_organization(self, org_id: int) -> int:
         """Count chatboxes for an organization."""
-        from sqlalchemy import func
         result = await self.session.execute(
             select(func.count(Chatbox.id)).where(Chatbox.organization_id == org_id)
         )
@@ -61,10 +87,16 @@ class ChatboxRepository:
     async def update(self, chatbox: Chatbox) -> Chatbox:
         """Update a chatbox."""
         await self.session.commit()
-        await self.session.refresh(chatbox)
         return chatbox
     
     async def delete(self, chatbox: Chatbox) -> None:
-        """Delete a chatbox."""
-        await self.session.delete(chatbox)
+        """
+        Delete a chatbox with its documents and chunks.
+        
+        Children are removed with one bulk DELETE per table instead of the
+        ORM cascade, which would first load every chunk (embeddings included).
+        """
+        await self.session.execute(delete(Chunk).where(Chunk.chatbox_id == chatbox.id))
+        await self.session.execute(delete(Document).where(Document.chatbox_id == chatbox.id))
+        await self.session.execute(delete(Chatbox).where(Chatbox.id == chatbox.id))
         await self.session.commit()
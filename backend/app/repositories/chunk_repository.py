@@ -1,113 +1,293 @@
 """Repository for Chunk operations with vector search."""
 
+from dataclasses import dataclass
 from typing import Optional
-from sqlalchemy import select, text
+import numpy as np
+from sqlalchemy import bindparam, delete, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.database import get_current_session, has_vector_codec
 from app.models.chunk import Chunk
 from app.core.logging_config import get_logger
 
 
 logger = get_logger(__name__)
 
+# Floor for hnsw.ef_search (pgvector's default)
+HNSW_EF_SEARCH_MIN = 40
+# Upper bound on tuples an iterative HNSW scan may visit
+HNSW_MAX_SCAN_TUPLES = 20000
+
+# Cleared once the server rejects the iterative scan settings
+_iterative_scan_supported = True
+
+COPY_COLUMNS = (
+    "document_id", "chatbox_id", "content", "chunk_index", "content_sha256", "embedding",
+)
+
+
+@dataclass(slots=True, frozen=True)
+class ChunkHit:
+    """A chunk returned by similarity search, with its score."""
+    
+    id: int
+    document_id: int
+    chatbox_id: int
+    content: str
+    chunk_index: int
+    score: float
+
 
 class ChunkRepository:
     """Handles database operations for Chunk including vector similarity search."""
     
-    def __init__(self, session: AsyncSession):
-        self.session = session
+    def __init__(self, session: Optional[AsyncSession] = None):
+        self.session = session or get_current_session()
     
     async def create_many(self, chunks: list[Chunk]) -> list[Chunk]:
-        """Bulk create chunks."""
+        """
+        Bulk create chunks.
+        
+        The flush sends one batched INSERT ... RETURNING for the ids, and the
+        session does not expire on commit, so no per-chunk refresh is needed.
+        """
         self.session.add_all(chunks)
         await self.session.commit()
-        for chunk in chunks:
-            await self.session.refresh(chunk)
         return chunks
     
-    async def delete_by_document(self, document_id: int) -> None:
-        """Delete all chunks for a document."""
+    async def insert_many(self, rows: list[dict], commit: bool = True) -> int:
+        """
+        Bulk insert chunk rows given as column dicts.
+        
+        Executes a single INSERT as executemany, skipping ORM object
+        construction. Returns the number of rows inserted.
+        """
+        if not rows:
+            return 0
+        await self.session.execute(insert(Chunk), rows)
+        if commit:
+            await self.session.commit()
+        return len(rows)
+    
+    async def copy_many(self, rows: list[dict], commit: bool = True) -> int:
+        """
+        Bulk insert chunk rows with binary COPY, falling back to insert_many.
+        
+        Embeddings are sent in pgvector's binary format (2 or 4 bytes per
+        dimension) instead of as text literals, which are several times
+        larger and slow to format; this wins even for a single row. The
+        binary codec is registered once per connection by init_db; the COPY
+        runs in a savepoint so a failure can still fall back to INSERT.
+        """
+        if not rows:
+            return 0
+        
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver = getattr(raw_connection, "driver_connection", None)
+        if not has_vector_codec(driver):
+            return await self.insert_many(rows, commit)
+        
+        try:
+            async with self.session.begin_nested():
+                await driver.copy_records_to_table(
+                    Chunk.__tablename__,
+                    records=[tuple(row[column] for column in COPY_COLUMNS) for row in rows],
+                    columns=COPY_COLUMNS,
+                )
+        except Exception as e:
+            logger.warning("COPY of %d chunks failed, using INSERT: %s", len(rows), e)
+            return await self.insert_many(rows, commit)
+        if commit:
+            await self.session.commit()
+        return len(rows)
+    
+    async def get_embeddings_by_hashes(self, chatbox_id: int, hashes: set[bytes]) -> dict:
+        """
+        Map content hashes to stored embeddings within a chatbox.
+        
+        Hashes with no embedded chunk are absent from the result.
+        """
+        if not hashes:
+            return {}
         result = await self.session.execute(
-            select(Chunk).where(Chunk.document_id == document_id)
+            select(Chunk.content_sha256, Chunk.embedding)
+            .where(
+                Chunk.chatbox_id == chatbox_id,
+                Chunk.content_sha256.in_(hashes),
+                Chunk.embedding.is_not(None),
+            )
+            .distinct(Chunk.content_sha256)
+        )
+        return {row.content_sha256: row.embedding for row in result}
+    
+    async def fill_embeddings(self, document_id: int, embeddings: dict) -> int:
+        """
+        Set missing embeddings of a document's chunks by content hash.
+        
+        Runs one UPDATE as executemany; chunks that already have an embedding
+        are left alone, so repeating the call is harmless. Does not commit.
+        """
+        if not embeddings:
+            return 0
+        chunks = Chunk.__table__
+        # Core statement: an ORM update() with a parameter list would be a
+        # bulk UPDATE by primary key instead
+        stmt = (
+            update(chunks)
+            .where(
+                chunks.c.document_id == bindparam("b_document_id"),
+                chunks.c.content_sha256 == bindparam("b_content_sha256"),
+                chunks.c.embedding.is_(None),
+            )
+            .values(embedding=bindparam("b_embedding"))
+        )
+        await self.session.execute(stmt, [
+            {
+                "b_document_id": document_id,
+                "b_content_sha256": content_hash,
+                "b_embedding": embedding,
+            }
+            for content_hash, embedding in embeddings.items()
+        ])
+        return len(embeddings)
+    
+    async def get_unembedded(self, document_id: int) -> dict[bytes, str]:
+        """Map content hashes of a document's chunks without an embedding to their text."""
+        result = await self.session.execute(
+            select(Chunk.content_sha256, Chunk.content)
+            .where(Chunk.document_id == document_id, Chunk.embedding.is_(None))
+            .distinct(Chunk.content_sha256)
+        )
+        return {row.content_sha256: row.content for row in result}
+    
+    async def delete_unembedded(self, document_id: int) -> None:
+        """Delete a document's chunks that have no embedding. Does not commit."""
+        await self.session.execute(
+            delete(Chunk).where(Chunk.document_id == document_id, Chunk.embedding.is_(None))
+        )
+    
+    async def delete_by_document(self, document_id: int) -> None:
+        """Delete all chunks for a document with a single DELETE statement."""
+        await self.session.execute(
+            delete(Chunk).where(Chunk.document_id == document_id)
         )
-        chunks = result.scalars().all()
-        for chunk in chunks:
-            await self.session.delete(chunk)
         await self.session.commit()
     
+    async def configure_search(self, top_k: int) -> None:
+        """
+        Size the HNSW candidate list for this query.
+        
+        ef_search must be at least top_k for the index to return enough rows;
+        a few times top_k keeps recall high. Every search filters on
+        chatbox_id after the ANN scan, so a chatbox holding a small share of
+        all chunks would lose most graph candidates; iterative scan
+        (pgvector >= 0.8) keeps expanding the search until enough matching
+        rows are found.
+        set_config(..., true) scopes each setting to the current transaction,
+        like SET LOCAL, and all of them go out in one statement.
+        
+        Older pgvector rejects the iterative scan settings, so they run in a
+        savepoint; on failure the transaction stays usable, the search
+        proceeds without them and later queries stop trying.
+        
+        similarity_search calls this itself unless told otherwise; calling
+        it first lets the round-trip overlap with embedding the query.
+        """
+        global _iterative_scan_supported
+        
+        ef_search = max(HNSW_EF_SEARCH_MIN, top_k * 4)
+        configs = [func.set_config("hnsw.ef_search", str(ef_search), True)]
+        if settings.vector_iterative_scan and _iterative_scan_supported:
+            try:
+                async with self.session.begin_nested():
+                    await self.session.execute(select(
+                        *configs,
+                        func.set_config("hnsw.iterative_scan", "strict_order", True),
+                        func.set_config("hnsw.max_scan_tuples", str(HNSW_MAX_SCAN_TUPLES), True),
+                    ))
+                return
+            except Exception as e:
+                _iterative_scan_supported = False
+                logger.warning("Iterative HNSW scan unavailable (needs pgvector >= 0.8): %s", e)
+        await self.session.execute(select(*configs))
+    
     async def similarity_search(
         self,
         chatbox_id: int,
-        query_embedding: list[float],
+        query_embedding: np.ndarray,
         top_k: int = 5,
         min_score: float = 0.7,
         document_id: Optional[int] = None,
-    ) -> list[tuple[Chunk, float]]:
+        configure: bool = True,
+    ) -> list[ChunkHit]:
         """
         Perform vector similarity search using pgvector.
         
-        Returns list of (Chunk, similarity_score) tuples.
+        query_embedding must be unit length (EmbeddingService guarantees it).
+        Returns ChunkHit rows ordered by descending similarity. Pass
+        configure=False if configure_search already ran in this transaction.
         
         TODO: This implementation requires pgvector extension enabled:
         CREATE EXTENSION IF NOT EXISTS vector;
-        
-        TODO: For better performance, create HNSW index:
-        CREATE INDEX ON chunks USING hnsw (embedding vector_cosine_ops);
         """
         try:
-            # Convert embedding to pgvector format
-            embedding_str = f"[{','.join(map(str, query_embedding))}]"
+            if configure:
+                await self.configure_search(top_k)
             
-            # Build query with vector similarity
-            # Using cosine similarity: 1 - (embedding <=> query_embedding)
-            query = """
-                SELECT id, document_id, chatbox_id, content, chunk_index, embedding,
-                       1 - (embedding <=> :embedding::vector) AS similarity
-                FROM chunks
-                WHERE chatbox_id = :chatbox_id
-            """
+            # Embeddings are unit length, so cosine similarity equals the inner
+            # product and `<#>` (negative inner product) skips the norm math of
+            # `<=>`. The query vector is a bound parameter, so the statement text
+            # stays constant and asyncpg can reuse its prepared plan.
+            distance = Chunk.embedding.max_inner_product(query_embedding)
+            similarity = (-distance).label("similarity")
             
-            params = {
-                "embedding": embedding_str,
-                "chatbox_id": chatbox_id,
-            }
+            # Project only what callers need; the embedding itself is ~6 KB per row
+            stmt = (
+                select(
+                    Chunk.id,
+                    Chunk.document_id,
+                    Chunk.chatbox_id,
+                    Chunk.content,
+                    Chunk.chunk_index,
+                    similarity,
+                )
+                .where(Chunk.chatbox_id == chatbox_id)
+            )
             
             # Add document filter if specified
             if document_id is not None:
-                query += " AND document_id = :document_id"
-                params["document_id"] = document_id
+                stmt = stmt.where(Chunk.document_id == document_id)
             
             # Filter by minimum score and limit
-            query += """
-                AND (1 - (embedding <=> :embedding::vector)) >= :min_score
-                ORDER BY embedding <=> :embedding::vector
-                LIMIT :top_k
-            """
-            params["min_score"] = min_score
-            params["top_k"] = top_k
+            stmt = (
+                stmt.where(distance <= -min_score)
+                .order_by(distance)
+                .limit(top_k)
+            )
             
-            result = await self.session.execute(text(query), params)
+            result = await self.session.execute(stmt)
             rows = result.fetchall()
             
-            # Convert rows to Chunk objects with scores
-            chunks_with_scores = []
-            for row in rows:
-                chunk = Chunk(
-                    id=row.id,
-                    document_id=row.document_id,
-                    chatbox_id=row.chatbox_id,
-                    content=row.content,
-                    chunk_index=row.chunk_index,
+            # Plain slotted records; no ORM instrumentation for read-only rows
+            return [
+                ChunkHit(
+                    row.id,
+                    row.document_id,
+                    row.chatbox_id,
+                    row.content,
+                    row.chunk_index,
+                    float(row.similarity),
                 )
-                score = float(row.similarity)
-                chunks_with_scores.append((chunk, score))
-            
-            return chunks_with_scores
+                for row in rows
+            ]
             
         except Exception as e:
             logger.warning(
-                f"Vector search failed (pgvector may not be enabled): {e}. "
-                "Falling back to stub implementation."
+                "Vector search failed (pgvector may not be enabled): %s. "
+                "Falling back to stub implementation.",
+                e,
             )
             # Fallback: return empty results in dev mode
             # TODO: Implement alternative search or ensure pgvector is enabled
@@ -1,26 +1,34 @@
 """Repository for Document operations."""
 
-from typing import Optional
-from sqlalchemy import select
+from datetime import timedelta
+from typing import Iterable, Optional
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import defer
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.document import Document
+from app.core.database import UTC_NOW, get_current_session
+from app.models.document import Document, DocumentStatus
 from app.core.exceptions import NotFoundError
 
 
 class DocumentRepository:
     """Handles database operations for Document."""
     
-    def __init__(self, session: AsyncSession):
-        self.session = session
+    def __init__(self, session: Optional[AsyncSession] = None):
+        self.session = session or get_current_session()
     
     async def create(self, document: Document) -> Document:
         """Create a new document."""
         self.session.add(document)
         await self.session.commit()
-        await self.session.refresh(document)
         return document
     
+    async def create_many(self, documents: list[Document]) -> list[Document]:
+        """Create several documents in one flush."""
+        self.session.add_all(documents)
+        await self.session.commit()
+        return documents
+    
     async def get_by_id(self, document_id: int) -> Document:
         """Get document by ID or raise NotFoundError."""
         result = await self.session.execute(
@@ -40,6 +48,23 @@ class DocumentRepository:
         )
         return result.scalar_one_or_none()
     
+    async def get_by_ids(self, document_ids: Iterable[int]) -> dict[int, Document]:
+        """
+        Get several documents in one query, keyed by ID.
+        
+        Missing IDs are absent from the result. raw_content is deferred,
+        since lookups like this only need the metadata.
+        """
+        ids = list(document_ids)
+        if not ids:
+            return {}
+        result = await self.session.execute(
+            select(Document)
+            .where(Document.id.in_(ids))
+            .options(defer(Document.raw_content))
+        )
+        return {document.id: document for document in result.scalars()}
+    
     async def list_by_chatbox(self, chatbox_id: int, limit: int = 100) -> list[Document]:
         """List documents for a chatbox."""
         result = await self.session.execute(
@@ -48,3 +73,46 @@ class DocumentRepository:
             .limit(limit)
         )
         return list(result.scalars().all())
+    
+    async def claim_pending_embeddings(
+        self, recheck_seconds: float, limit: int = 20
+    ) -> list[tuple[int, str]]:
+        """
+        Claim documents waiting on an embedding batch job that are due a check.
+        
+        Returns (document id, batch id) pairs, least recently checked first,
+        and stamps them as checked, so the next round moves on to other
+        documents and concurrent workers skip these. Rows locked by another
+        worker are skipped; commit right away to release the locks.
+        """
+        due = (
+            select(Document.id)
+            .where(
+                Document.status == DocumentStatus.PENDING,
+                or_(
+                    Document.embedding_checked_at.is_(None),
+                    Document.embedding_checked_at < UTC_NOW - timedelta(seconds=recheck_seconds),
+                ),
+            )
+            .order_by(Document.embedding_checked_at.asc().nulls_first(), Document.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await self.session.execute(
+            update(Document)
+            .where(Document.id.in_(due))
+            # Keep updated_at: a status check doesn't change the document
+            .values(embedding_checked_at=UTC_NOW, updated_at=Document.updated_at)
+            .returning(Document.id, Document.embedding_batch_id)
+            .execution_options(synchronize_session=False)
+        )
+        return [(row.id, row.embedding_batch_id) for row in result]
+    
+    async def finish_embedding(self, document_id: int, status: DocumentStatus) -> None:
+        """Set a pending document's final status and clear its batch id. Does not commit."""
+        await self.session.execute(
+            update(Document)
+            .where(Document.id == document_id)
+            .values(status=status, embedding_batch_id=None)
+            .execution_options(synchronize_session=False)
+        )
@@ -1,22 +1,42 @@
 """Ingestion schemas."""
 
 from typing import Optional
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, model_validator
 
 
 class IngestTextRequest(BaseModel):
     """Request schema for ingesting raw text."""
     
     chatbox_id: int = Field(..., description="Chatbox ID to ingest into")
-    text: str = Field(..., min_length=1, description="Text content to ingest")
+    text: Optional[str] = Field(None, min_length=1, description="Text content to ingest")
+    texts: Optional[list[str]] = Field(
+        None,
+        min_length=1,
+        description="Several texts to ingest as separate documents in one batch",
+    )
     source_name: Optional[str] = Field(None, description="Optional name/label for this content")
+    
+    @model_validator(mode="after")
+    def check_text_or_texts(self) -> "IngestTextRequest":
+        """Require exactly one of text or texts, with no empty entries."""
+        if (self.text is None) == (self.texts is None):
+            raise ValueError("Provide exactly one of 'text' or 'texts'")
+        if self.texts is not None and not all(t.strip() for t in self.texts):
+            raise ValueError("'texts' must not contain empty entries")
+        return self
 
 
 class IngestTextResponse(BaseModel):
     """Response schema for text ingestion."""
     
     document_id: int
+    document_ids: Optional[list[int]] = Field(
+        None, description="All created document IDs when 'texts' was used"
+    )
     chunks_created: int
+    status: str = Field(
+        "ready", description="'pending' while embeddings are computed in the background"
+    )
     message: str
 
 
@@ -34,6 +54,9 @@ class IngestURLResponse(BaseModel):
     document_id: int
     chunks_created: int
     url: str
+    status: str = Field(
+        "ready", description="'pending' while embeddings are computed in the background"
+    )
     message: str
 
 
@@ -44,4 +67,7 @@ class UploadResponse(BaseModel):
     chunks_created: int
     filename: str
     file_size_bytes: int
+    status: str = Field(
+        "ready", description="'pending' while embeddings are computed in the background"
+    )
     message: str
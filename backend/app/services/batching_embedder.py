@@ -0,0 +1,136 @@
+"""Coalesces concurrent embedding calls into shared OpenAI requests."""
+
+import asyncio
+from typing import Optional
+import numpy as np
+
+from app.services.embedding_service import EmbeddingService
+from app.core.logging_config import get_logger
+
+
+logger = get_logger(__name__)
+
+# Collect calls for up to this long, or until this many texts are pending
+COALESCE_MAX_WAIT_SECONDS = 0.02
+COALESCE_MAX_TEXTS = 128
+
+
+def _is_input_error(error: Exception) -> bool:
+    """Whether an embeddings request was rejected for its input (4xx other than 429)."""
+    response = getattr(error.__cause__, "response", None)
+    status_code = getattr(response, "status_code", None)
+    return status_code is not None and 400 <= status_code < 500 and status_code != 429
+
+
+class BatchingEmbedder:
+    """
+    Drop-in front for EmbeddingService.embed_texts that merges small calls.
+    
+    Calls arriving within a short window are sent as one embeddings request
+    and the results are split back per caller, so bursts of small ingests
+    cost one HTTPS round-trip instead of one each. Calls that are already
+    large, and stub mode (no remote API), go straight through.
+    """
+    
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        max_wait_seconds: float = COALESCE_MAX_WAIT_SECONDS,
+        max_texts: int = COALESCE_MAX_TEXTS,
+    ):
+        self.embedding_service = embedding_service
+        self.max_wait_seconds = max_wait_seconds
+        self.max_texts = max_texts
+        self._queue: asyncio.Queue[tuple[list[str], asyncio.Future]] = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._flushes: set[asyncio.Task] = set()
+    
+    async def embed_text(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text."""
+        embeddings = await self.embed_texts([text])
+        return embeddings[0]
+    
+    async def embed_texts(self, texts: list[str]) -> np.ndarray:
+        """Generate embeddings, sharing the request with concurrent callers."""
+        service = self.embedding_service
+        remote = service.http_client or service.openai_client
+        if not texts or not remote or len(texts) >= self.max_texts:
+            return await service.embed_texts(texts)
+        
+        loop = asyncio.get_running_loop()
+        if self._worker is None:
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        self._queue.put_nowait((texts, future))
+        return await future
+    
+    @property
+    def model_key(self) -> str:
+        """Identifies the model behind these embeddings (see EmbeddingService)."""
+        return self.embedding_service.model_key
+    
+    @property
+    def supports_batch_api(self) -> bool:
+        """Whether large jobs can be sent through the OpenAI Batch API."""
+        return self.embedding_service.supports_batch_api
+    
+    async def submit_batch(self, texts: dict[str, str]) -> str:
+        """Submit texts to the OpenAI Batch API (see EmbeddingService)."""
+        return await self.embedding_service.submit_batch(texts)
+    
+    async def close(self) -> None:
+        """Stop the coalescing worker and wait for in-flight requests."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+    
+    async def _run(self) -> None:
+        """Gather queued calls into windows and flush each one."""
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            count = len(pending[0][0])
+            deadline = loop.time() + self.max_wait_seconds
+            
+            while count < self.max_texts:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                count += len(item[0])
+            
+            # Flush in the background so the next window starts right away
+            task = loop.create_task(self._flush(pending))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+    
+    async def _flush(self, pending: list[tuple[list[str], asyncio.Future]]) -> None:
+        """Embed one window of calls and hand each caller its slice (a view)."""
+        texts = [text for batch, _ in pending for text in batch]
+        logger.debug("Embedding %s texts for %s coalesced calls", len(texts), len(pending))
+        
+        try:
+            embeddings = await self.embedding_service.embed_texts(texts)
+        except Exception as e:
+            if len(pending) > 1 and _is_input_error(e):
+                # One bad input must not fail the other callers; retry each alone
+                await asyncio.gather(*(self._flush([item]) for item in pending))
+                return
+            # Rate limits and outages would only get worse with more requests
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        offset = 0
+        for batch, future in pending:
+            if not future.done():
+                future.set_result(embeddings[offset:offset + len(batch)])
+            offset += len(batch)
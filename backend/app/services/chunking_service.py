@@ -1,6 +1,6 @@
 """Text chunking service."""
 
-from typing import List
+from typing import Iterator, List
 from app.core.config import settings
 from app.core.logging_config import get_logger
 
@@ -33,28 +33,39 @@ class ChunkingService:
         - Semantic chunking
         - Language-specific tokenization
         """
-        if not text or not text.strip():
-            return []
+        chunks = list(self.iter_chunks(text))
+        logger.debug("Chunked text into %s chunks", len(chunks))
+        return chunks
+    
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """Yield the chunks of chunk_text one at a time, without building a list."""
+        if not text or text.isspace():
+            return
         
-        chunks = []
-        start = 0
+        chunk_size = self.chunk_size
+        step = chunk_size - self.chunk_overlap
         text_length = len(text)
+        start = 0
         
         while start < text_length:
-            # Get chunk
-            end = start + self.chunk_size
-            chunk = text[start:end]
+            # Get chunk; strip() returns the slice itself when there is
+            # nothing to trim, so this is usually a single copy
+            chunk = text[start:start + chunk_size].strip()
             
             # Skip empty chunks
-            if chunk.strip():
-                chunks.append(chunk.strip())
-            
-            # Move start position (with overlap)
-            start += self.chunk_size - self.chunk_overlap
+            if chunk:
+                yield chunk
             
-            # Avoid infinite loop
-            if start <= 0:
+            # Avoid infinite loop when overlap >= chunk size
+            if step <= 0:
                 break
-        
-        logger.debug(f"Chunked text into {len(chunks)} chunks")
-        return chunks
+            
+            # Move start position (with overlap)
+            start += step
+    
+    def max_chunks(self, text: str) -> int:
+        """Upper bound on the number of chunks text splits into."""
+        step = self.chunk_size - self.chunk_overlap
+        if step <= 0:
+            return 1 if text else 0
+        return -(-len(text) // step)
@@ -0,0 +1,131 @@
+"""Background completion of documents embedded through the OpenAI Batch API."""
+
+import asyncio
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import new_session
+from app.core.exceptions import ExternalServiceError
+from app.core.logging_config import get_logger
+from app.models.document import DocumentStatus
+from app.repositories.chunk_repository import ChunkRepository
+from app.repositories.document_repository import DocumentRepository
+from app.services.embedding_service import EmbeddingService
+
+
+logger = get_logger(__name__)
+
+
+class EmbeddingBatchPoller:
+    """
+    Periodically checks PENDING documents and stores finished embeddings.
+    
+    IngestionService submits large documents to the Batch API and stores
+    their chunks without vectors, so they are invisible to search. Once a
+    batch completes, its embeddings are written to the chunks by content
+    hash and the document becomes READY. Chunks the batch left out are
+    embedded through the regular API; if that fails too they are deleted
+    and the document becomes FAILED.
+    """
+    
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        interval_seconds: Optional[float] = None,
+    ):
+        self.embedding_service = embedding_service
+        self.interval_seconds = interval_seconds or settings.embedding_batch_poll_seconds
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        """Start polling, if batch ingestion is enabled."""
+        if settings.embedding_batch_threshold <= 0 or not self.embedding_service.supports_batch_api:
+            return
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def close(self) -> None:
+        """Stop polling."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _run(self) -> None:
+        """Poll forever; a failed round is logged and retried next interval."""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error("Embedding batch poll failed: %s", e)
+    
+    async def poll_once(self) -> int:
+        """
+        Check pending documents that are due and store finished embeddings.
+        
+        Returns: number of documents that became READY
+        """
+        session = new_session()
+        if session is None:
+            return 0
+        
+        completed = 0
+        async with session:
+            claimed = await DocumentRepository(session).claim_pending_embeddings(
+                recheck_seconds=self.interval_seconds / 2
+            )
+            # Release the row locks before talking to OpenAI
+            await session.commit()
+            
+            for document_id, batch_id in claimed:
+                try:
+                    results = await self.embedding_service.get_batch_results(batch_id)
+                except ExternalServiceError as e:
+                    # Checked again in a later round
+                    logger.warning("Checking embedding batch %s failed: %s", batch_id, e)
+                    continue
+                
+                if results is None:
+                    continue
+                
+                if await self._complete(session, document_id, results):
+                    completed += 1
+        
+        return completed
+    
+    async def _complete(self, session: AsyncSession, document_id: int, results: dict) -> bool:
+        """
+        Store a finished batch's embeddings and settle the document's status.
+        
+        Returns: whether the document became READY
+        """
+        chunk_repo = ChunkRepository(session)
+        await chunk_repo.fill_embeddings(
+            document_id,
+            {bytes.fromhex(custom_id): embedding for custom_id, embedding in results.items()},
+        )
+        missing = await chunk_repo.get_unembedded(document_id)
+        # Don't keep a transaction open across the embeddings request
+        await session.commit()
+        
+        status = DocumentStatus.READY
+        if missing:
+            try:
+                embeddings = await self.embedding_service.embed_texts(list(missing.values()))
+            except ExternalServiceError as e:
+                logger.error(
+                    "Embedding %s leftover chunks of document %s failed: %s",
+                    len(missing), document_id, e,
+                )
+                await chunk_repo.delete_unembedded(document_id)
+                status = DocumentStatus.FAILED
+            else:
+                await chunk_repo.fill_embeddings(document_id, dict(zip(missing, embeddings)))
+        
+        await DocumentRepository(session).finish_embedding(document_id, status)
+        await session.commit()
+        logger.info("Stored batch embeddings for document %s (%s)", document_id, status.value)
+        return status == DocumentStatus.READY
@@ -1,7 +1,25 @@
 """Embedding service with OpenAI integration and stub for dev mode."""
 
-from typing import Optional
+import asyncio
+import hashlib
+from typing import Iterator, Optional
 import numpy as np
+import orjson
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 from app.core.config import settings
 from app.core.exceptions import ExternalServiceError
@@ -10,6 +28,84 @@ from app.core.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+OPENAI_API_BASE = "https://api.openai.com/v1"
+
+# Per-request limits of the embeddings endpoint (300k tokens, 2048 inputs), with
+# headroom since tokens may be estimated (see _count_tokens)
+EMBED_BATCH_MAX_TOKENS = 200_000
+EMBED_BATCH_MAX_INPUTS = 2048
+# Tokenizer of the text-embedding-3 models, for sizing sub-batches
+TOKEN_ENCODING = "cl100k_base"
+
+# Retry rate limits and transient server errors with exponential backoff
+EMBED_MAX_ATTEMPTS = 4
+EMBED_RETRY_BASE_SECONDS = 0.5
+EMBED_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Batch API job states that will never produce output
+BATCH_FAILED_STATUSES = frozenset({"failed", "expired", "cancelling", "cancelled"})
+
+
+def _stable_hash(text: str) -> int:
+    """64-bit hash of text that, unlike hash(), is not salted per process."""
+    data = text.encode("utf-8", "surrogatepass")
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+# tiktoken encoding, loaded on first use (False if unavailable)
+_token_encoding = None
+
+
+def _get_token_encoding():
+    """Return the tiktoken encoding, or None to estimate from bytes."""
+    global _token_encoding
+    if _token_encoding is None:
+        _token_encoding = False
+        if tiktoken is not None:
+            try:
+                _token_encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                # The encoding file is downloaded on first use
+                logger.warning("tiktoken encoding unavailable, estimating tokens from bytes: %s", e)
+    return _token_encoding or None
+
+
+def _count_tokens(texts: list[str]) -> list[int]:
+    """
+    Token counts used to keep each request under the API's token limit.
+    
+    Exact with tiktoken. Otherwise half the UTF-8 length: several times
+    too high for English, but unlike a characters/4 estimate it does not
+    undercount CJK and other multi-byte scripts, where a character is a
+    token or more. EMBED_BATCH_MAX_TOKENS leaves headroom for the rest.
+    """
+    encoding = _get_token_encoding()
+    if encoding is not None:
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+    return [len(text.encode()) // 2 + 1 for text in texts]
+
+
+def _partition(texts: list[str]) -> Iterator[list[str]]:
+    """Split texts into sub-batches that fit one embeddings request."""
+    max_inputs = min(settings.embed_batch_size, EMBED_BATCH_MAX_INPUTS)
+    batch: list[str] = []
+    batch_tokens = 0
+    for text, tokens in zip(texts, _count_tokens(texts)):
+        if batch and (
+            batch_tokens + tokens > EMBED_BATCH_MAX_TOKENS
+            or len(batch) >= max_inputs
+        ):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
 
 class EmbeddingService:
     """
@@ -21,66 +117,275 @@ class EmbeddingService:
     
     def __init__(self):
         self.openai_client: Optional[any] = None
+        self.http_client: Optional[any] = None
         self.embedding_dim = 1536  # OpenAI text-embedding-3-small dimension
+        # Sub-batch requests in flight per process
+        self._semaphore = asyncio.Semaphore(max(settings.embed_parallelism, 1))
         
         # Initialize OpenAI client if key is available
         if settings.openai_api_key:
             try:
-                from openai import AsyncOpenAI
-                self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
+                if httpx is None:
+                    raise ImportError("httpx")
+                # Fast path: raw HTTP/2 client, orjson in both directions and
+                # no per-item SDK model parsing of megabyte-sized responses
+                self.http_client = self._build_http_client()
                 logger.info("OpenAI embeddings initialized")
             except ImportError:
-                logger.warning("openai package not installed. Using stub embeddings.")
+                try:
+                    from openai import AsyncOpenAI
+                    self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
+                    logger.info("OpenAI embeddings initialized (SDK client)")
+                except ImportError:
+                    logger.warning("openai package not installed. Using stub embeddings.")
             except Exception as e:
-                logger.warning(f"Failed to initialize OpenAI client: {e}. Using stub embeddings.")
+                logger.warning("Failed to initialize OpenAI client: %s. Using stub embeddings.", e)
+            # Load the tokenizer at startup rather than on the first request
+            _get_token_encoding()
         else:
             logger.info("OpenAI API key not configured. Using stub embeddings in dev mode.")
     
-    async def embed_text(self, text: str) -> list[float]:
-        """Generate embedding for a single text."""
-        return await self.embed_texts([text])[0]
+    @staticmethod
+    def _build_http_client() -> "httpx.AsyncClient":
+        """
+        Raw HTTP/2 client for the embeddings API.
+        
+        Without the h2 package it falls back to HTTP/1.1; the ImportError
+        must not reach __init__, which would switch to the SDK client and
+        lose the fast path and the Batch API.
+        """
+        options = {
+            "base_url": OPENAI_API_BASE,
+            "headers": {"Authorization": f"Bearer {settings.openai_api_key}"},
+            "timeout": 60.0,
+        }
+        try:
+            return httpx.AsyncClient(http2=True, **options)
+        except ImportError:
+            logger.warning("h2 package not installed. Embeddings client will use HTTP/1.1.")
+            return httpx.AsyncClient(**options)
     
-    async def embed_texts(self, texts: list[str]) -> list[list[float]]:
+    async def embed_text(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text (1-D float32 array)."""
+        embeddings = await self.embed_texts([text])
+        return embeddings[0]
+    
+    async def embed_texts(self, texts: list[str]) -> np.ndarray:
         """
         Generate embeddings for multiple texts.
         
         Uses OpenAI if configured, otherwise returns stub embeddings.
+        Embeddings are always unit length, which the inner-product search
+        in ChunkRepository relies on.
+        
+        Returns a float32 array of shape (len(texts), dim). Rows are views
+        that pgvector binds directly, with no per-float Python objects.
         """
         if not texts:
-            return []
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
         
-        # Use OpenAI if available
-        if self.openai_client:
+        # Use OpenAI if available; large inputs are split into sub-batches
+        # that run concurrently (bounded by the semaphore)
+        if self.http_client or self.openai_client:
+            results = await asyncio.gather(
+                *(self._embed_batch(batch) for batch in _partition(texts))
+            )
+            return self._normalize([embedding for result in results for embedding in result])
+        
+        # Fallback: Generate stub embeddings (for dev mode)
+        logger.debug("Using stub embeddings (dev mode)")
+        return self._generate_stub_embeddings(texts)
+    
+    async def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed one sub-batch with OpenAI."""
+        async with self._semaphore:
             try:
+                if self.http_client:
+                    return await self._post_embeddings(texts)
+                # The SDK client retries 429/5xx on its own
                 response = await self.openai_client.embeddings.create(
                     model=settings.openai_embedding_model,
                     input=texts,
                 )
                 return [item.embedding for item in response.data]
             except Exception as e:
-                logger.error(f"OpenAI embedding failed: {e}")
+                logger.error("OpenAI embedding failed: %s", e)
+                # Chained so callers can tell rejected input from outages
                 raise ExternalServiceError(
                     f"Failed to generate embeddings: {str(e)}",
                     service="openai"
+                ) from e
+    
+    async def _post_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """POST to /embeddings, retrying rate limits and transient failures."""
+        body = orjson.dumps({
+            "model": settings.openai_embedding_model,
+            "input": texts,
+        })
+        for attempt in range(EMBED_MAX_ATTEMPTS):
+            last_attempt = attempt == EMBED_MAX_ATTEMPTS - 1
+            try:
+                response = await self.http_client.post(
+                    "/embeddings", content=body, headers=JSON_HEADERS
                 )
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in EMBED_RETRY_STATUSES or last_attempt:
+                    response.raise_for_status()
+                    data = orjson.loads(response.content)["data"]
+                    return [item["embedding"] for item in data]
+            
+            delay = EMBED_RETRY_BASE_SECONDS * 2 ** attempt
+            logger.warning("OpenAI embedding request failed, retrying in %ss", delay)
+            await asyncio.sleep(delay)
+    
+    @property
+    def model_key(self) -> str:
+        """Identifies the model behind these embeddings ("stub" in dev mode)."""
+        if self.http_client or self.openai_client:
+            return f"openai:{settings.openai_embedding_model}"
+        return "stub"
+    
+    @property
+    def supports_batch_api(self) -> bool:
+        """Whether large jobs can be sent through the OpenAI Batch API."""
+        return self.http_client is not None
+    
+    async def submit_batch(self, texts: dict[str, str]) -> str:
+        """
+        Submit texts to the OpenAI Batch API and return the batch id.
         
-        # Fallback: Generate stub embeddings (for dev mode)
-        logger.debug("Using stub embeddings (dev mode)")
-        return [self._generate_stub_embedding(text) for text in texts]
+        Keys are caller-chosen ids that come back with the results. Batch
+        jobs cost half as much as synchronous calls and do not count
+        against the per-minute rate limits, but finish within 24 hours
+        rather than seconds; poll with get_batch_results().
+        """
+        model = settings.openai_embedding_model
+        lines = b"\n".join(
+            orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/embeddings",
+                "body": {"model": model, "input": text},
+            })
+            for custom_id, text in texts.items()
+        )
+        
+        try:
+            response = await self.http_client.post(
+                "/files",
+                data={"purpose": "batch"},
+                files={"file": ("embeddings.jsonl", lines, "application/jsonl")},
+            )
+            response.raise_for_status()
+            input_file_id = orjson.loads(response.content)["id"]
+            
+            response = await self.http_client.post(
+                "/batches",
+                content=orjson.dumps({
+                    "input_file_id": input_file_id,
+                    "endpoint": "/v1/embeddings",
+                    "completion_window": "24h",
+                }),
+                headers=JSON_HEADERS,
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.error("OpenAI batch submission failed: %s", e)
+            raise ExternalServiceError(
+                f"Failed to submit embedding batch: {str(e)}",
+                service="openai"
+            )
+        
+        batch_id = orjson.loads(response.content)["id"]
+        logger.info("Submitted embedding batch %s with %s inputs", batch_id, len(texts))
+        return batch_id
+    
+    async def get_batch_results(self, batch_id: str) -> Optional[dict[str, np.ndarray]]:
+        """
+        Fetch the embeddings of a finished batch, keyed by custom id.
+        
+        Returns None while the batch is still running. Requests that failed
+        are absent from the result, as is every request of a batch that
+        failed, expired or was cancelled; callers embed those another way.
+        Raises ExternalServiceError if the batch could not be retrieved.
+        """
+        try:
+            response = await self.http_client.get(f"/batches/{batch_id}")
+            response.raise_for_status()
+            batch = orjson.loads(response.content)
+            
+            status = batch["status"]
+            if status in BATCH_FAILED_STATUSES:
+                logger.warning("Embedding batch %s ended as %s", batch_id, status)
+                return {}
+            if status != "completed":
+                return None
+            if not batch.get("output_file_id"):
+                logger.warning("Embedding batch %s produced no output", batch_id)
+                return {}
+            
+            response = await self.http_client.get(f"/files/{batch['output_file_id']}/content")
+            response.raise_for_status()
+        except Exception as e:
+            logger.error("OpenAI batch retrieval failed: %s", e)
+            raise ExternalServiceError(
+                f"Failed to retrieve embedding batch: {str(e)}",
+                service="openai"
+            )
+        
+        custom_ids = []
+        embeddings = []
+        failed = 0
+        for line in response.content.splitlines():
+            if not line:
+                continue
+            item = orjson.loads(line)
+            body = (item.get("response") or {}).get("body") or {}
+            if not body.get("data"):
+                failed += 1
+                continue
+            custom_ids.append(item["custom_id"])
+            embeddings.append(body["data"][0]["embedding"])
+        
+        if failed:
+            logger.warning("Embedding batch %s has %s failed requests", batch_id, failed)
+        if not embeddings:
+            return {}
+        return dict(zip(custom_ids, self._normalize(embeddings)))
+    
+    @staticmethod
+    def _normalize(embeddings: list[list[float]]) -> np.ndarray:
+        """L2-normalize each embedding (OpenAI's are only approximately unit length)."""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP connections."""
+        if self.http_client:
+            await self.http_client.aclose()
     
-    def _generate_stub_embedding(self, text: str) -> list[float]:
+    def _generate_stub_embeddings(self, texts: list[str]) -> np.ndarray:
         """
-        Generate a deterministic stub embedding for dev mode.
+        Generate deterministic stub embeddings for dev mode.
         
-        Uses text hash to create consistent embeddings.
+        Each row is seeded from a stable hash of its text, so the same text
+        maps to the same vector in every process and across restarts; rows
+        share one array and are normalized together.
         """
-        # Create a pseudo-random but deterministic embedding based on text hash
-        np.random.seed(hash(text) % (2**32))
-        embedding = np.random.randn(self.embedding_dim).tolist()
+        embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        for row, text in zip(embeddings, texts):
+            rng = np.random.Generator(np.random.PCG64(_stable_hash(text)))
+            rng.standard_normal(out=row, dtype=np.float32)
         
-        # Normalize to unit vector (common practice)
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = (np.array(embedding) / norm).tolist()
+        # Normalize to unit vectors (common practice)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings /= norms
         
-        return embedding
+        return embeddings
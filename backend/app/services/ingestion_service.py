@@ -1,41 +1,103 @@
 """Ingestion service for processing and storing documents."""
 
-from typing import Optional
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import codecs
+import hashlib
+from itertools import count, islice
+from typing import BinaryIO, Optional, Union
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.document import Document, DocumentType
-from app.models.chunk import Chunk
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    # Fallback: BeautifulSoup, with the lxml C parser when installed
+    HTMLParser = None
+    from bs4 import BeautifulSoup
+    try:
+        import lxml  # noqa: F401
+        BS4_PARSER = "lxml"
+    except ImportError:
+        BS4_PARSER = "html.parser"
+
+from app.models.chunk import EMBEDDING_DTYPE
+from app.models.document import Document, DocumentStatus, DocumentType
 from app.repositories.document_repository import DocumentRepository
 from app.repositories.chunk_repository import ChunkRepository
 from app.services.chunking_service import ChunkingService
 from app.services.embedding_service import EmbeddingService
+from app.services.batching_embedder import BatchingEmbedder
+from app.core.config import settings
 from app.core.logging_config import get_logger
 from app.core.exceptions import ValidationError, ExternalServiceError
 
 
 logger = get_logger(__name__)
 
+# Chunks embedded and stored per step of the streaming ingest pipeline
+INGEST_WINDOW_CHUNKS = 512
+
+
+def extract_html_text(html: bytes) -> str:
+    """
+    Extract visible text from an HTML page, one text block per line.
+    
+    Both parsers produce the same text (stripped, non-empty text nodes of
+    the whole document, title included), so chunk hashes don't depend on
+    which one is installed.
+    """
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        for node in tree.css("script, style"):
+            node.decompose()
+        if tree.root is None:
+            return ""
+        texts = (
+            node.text_content.strip()
+            for node in tree.root.traverse(include_text=True)
+            if node.tag == "-text"
+        )
+        return "\n".join(text for text in texts if text)
+    
+    soup = BeautifulSoup(html, BS4_PARSER)
+    for node in soup(["script", "style"]):
+        node.decompose()
+    return soup.get_text(separator="\n", strip=True)
+
 
 class IngestionService:
     """
     Handles document ingestion: chunking, embedding, and storage.
+    
+    Built once at startup; the per-request database session is passed
+    to each call and wrapped in lightweight repositories.
     """
     
     def __init__(
         self,
-        document_repo: DocumentRepository,
-        chunk_repo: ChunkRepository,
         chunking_service: ChunkingService,
-        embedding_service: EmbeddingService,
+        embedding_service: Union[EmbeddingService, BatchingEmbedder],
     ):
-        self.document_repo = document_repo
-        self.chunk_repo = chunk_repo
         self.chunking_service = chunking_service
         self.embedding_service = embedding_service
+        
+        # Pooled client for URL ingestion: keep-alive across fetches and no
+        # blocking of the event loop while pages download
+        self.http_client = httpx.AsyncClient(
+            timeout=10.0,
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP connections and stop embedding batching."""
+        await self.http_client.aclose()
+        if isinstance(self.embedding_service, BatchingEmbedder):
+            await self.embedding_service.close()
     
     async def ingest_text(
         self,
+        session: AsyncSession,
         chatbox_id: int,
         text: str,
         source_name: Optional[str] = None,
@@ -45,7 +107,7 @@ class IngestionService:
         
         Returns: (Document, number of chunks created)
         """
-        logger.info(f"Ingesting text for chatbox {chatbox_id}")
+        logger.info("Ingesting text for chatbox %s", chatbox_id)
         
         # Create document
         document = Document(
@@ -54,38 +116,82 @@ class IngestionService:
             source_name=source_name or "Raw Text",
             raw_content=text,
         )
-        document = await self.document_repo.create(document)
+        document = await DocumentRepository(session).create(document)
         
-        # Chunk text
-        chunks_text = self.chunking_service.chunk_text(text)
+        # Chunk, embed and store
+        chunks_created = await self._store_chunks(session, document, text)
         
-        if not chunks_text:
+        if not chunks_created:
             logger.warning("No chunks created from text")
             return document, 0
         
-        # Generate embeddings
-        embeddings = await self.embedding_service.embed_texts(chunks_text)
+        logger.info("Created document %s with %s chunks", document.id, chunks_created)
+        return document, chunks_created
+    
+    async def ingest_texts_batch(
+        self,
+        session: AsyncSession,
+        chatbox_id: int,
+        texts: list[str],
+        source_name: Optional[str] = None,
+    ) -> tuple[list[Document], int]:
+        """
+        Ingest several raw texts as separate documents in one pass.
+        
+        All chunks from all texts are embedded with a single embedding call
+        and stored with a single bulk COPY or INSERT.
         
-        # Create chunk objects
-        chunks = []
-        for i, (chunk_text, embedding) in enumerate(zip(chunks_text, embeddings)):
-            chunk = Chunk(
-                document_id=document.id,
+        Returns: (Documents in input order, total number of chunks created)
+        """
+        logger.info("Ingesting %s texts for chatbox %s", len(texts), chatbox_id)
+        
+        # Create documents
+        documents = [
+            Document(
                 chatbox_id=chatbox_id,
-                content=chunk_text,
-                chunk_index=i,
-                embedding=embedding,
+                source_type=DocumentType.TEXT,
+                source_name=source_name or "Raw Text",
+                raw_content=text,
             )
-            chunks.append(chunk)
-        
-        # Store chunks
-        await self.chunk_repo.create_many(chunks)
+            for text in texts
+        ]
+        documents = await DocumentRepository(session).create_many(documents)
+        
+        # Chunk every text, remembering which document each chunk belongs to
+        owners = []
+        chunks_text = []
+        for document, text in zip(documents, texts):
+            for i, chunk_text in enumerate(self.chunking_service.chunk_text(text)):
+                owners.append((document.id, i))
+                chunks_text.append(chunk_text)
         
-        logger.info(f"Created document {document.id} with {len(chunks)} chunks")
-        return document, len(chunks)
+        if not chunks_text:
+            logger.warning("No chunks created from texts")
+            return documents, 0
+        
+        # Generate all embeddings in one request
+        hashes, embeddings = await self._embed_chunks(session, chatbox_id, chunks_text)
+        
+        rows = [
+            {
+                "document_id": document_id,
+                "chatbox_id": chatbox_id,
+                "content": chunk_text,
+                "chunk_index": chunk_index,
+                "content_sha256": content_hash,
+                "embedding": embedding,
+            }
+            for (document_id, chunk_index), chunk_text, content_hash, embedding
+            in zip(owners, chunks_text, hashes, embeddings)
+        ]
+        chunks_created = await ChunkRepository(session).copy_many(rows)
+        
+        logger.info("Created %s documents with %s chunks", len(documents), chunks_created)
+        return documents, chunks_created
     
     async def ingest_url(
         self,
+        session: AsyncSession,
         chatbox_id: int,
         url: str,
         depth: int = 1,
@@ -101,31 +207,25 @@ class IngestionService:
         
         For now: simple single-page fetch.
         """
-        logger.info(f"Ingesting URL {url} for chatbox {chatbox_id}")
+        logger.info("Ingesting URL %s for chatbox %s", url, chatbox_id)
         
         try:
             # Fetch URL content
-            response = requests.get(url, timeout=10)
+            response = await self.http_client.get(url)
             response.raise_for_status()
             
-            # Extract text from HTML
-            soup = BeautifulSoup(response.content, "html.parser")
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Get text
-            text = soup.get_text(separator="\n", strip=True)
+            # Extract text from HTML (script and style contents dropped); parsing
+            # is CPU-bound, so it runs in a worker thread off the event loop
+            text = await asyncio.to_thread(extract_html_text, response.content)
             
             if not text or len(text.strip()) < 10:
                 raise ValidationError("URL contains no extractable text")
             
-        except requests.RequestException as e:
-            logger.error(f"Failed to fetch URL {url}: {e}")
+        except httpx.HTTPError as e:
+            logger.error("Failed to fetch URL %s: %s", url, e)
             raise ExternalServiceError(f"Failed to fetch URL: {str(e)}", service="url_fetch")
         except Exception as e:
-            logger.error(f"Failed to process URL {url}: {e}")
+            logger.error("Failed to process URL %s: %s", url, e)
             raise ValidationError(f"Failed to process URL: {str(e)}")
         
         # Create document
@@ -136,43 +236,32 @@ class IngestionService:
             source_url=url,
             raw_content=text,
         )
-        document = await self.document_repo.create(document)
+        document = await DocumentRepository(session).create(document)
         
-        # Chunk and embed (reuse logic from ingest_text)
-        chunks_text = self.chunking_service.chunk_text(text)
+        # Chunk, embed and store
+        chunks_created = await self._store_chunks(session, document, text)
         
-        if not chunks_text:
+        if not chunks_created:
             logger.warning("No chunks created from URL content")
             return document, 0
         
-        embeddings = await self.embedding_service.embed_texts(chunks_text)
-        
-        chunks = []
-        for i, (chunk_text, embedding) in enumerate(zip(chunks_text, embeddings)):
-            chunk = Chunk(
-                document_id=document.id,
-                chatbox_id=chatbox_id,
-                content=chunk_text,
-                chunk_index=i,
-                embedding=embedding,
-            )
-            chunks.append(chunk)
-        
-        await self.chunk_repo.create_many(chunks)
-        
-        logger.info(f"Created document {document.id} from URL with {len(chunks)} chunks")
-        return document, len(chunks)
+        logger.info("Created document %s from URL with %s chunks", document.id, chunks_created)
+        return document, chunks_created
     
     async def ingest_file(
         self,
+        session: AsyncSession,
         chatbox_id: int,
         filename: str,
-        content: bytes,
+        file: BinaryIO,
+        file_size: int,
         mime_type: Optional[str] = None,
     ) -> tuple[Document, int]:
         """
         Ingest uploaded file: extract text, chunk, embed, and store.
         
+        The file is read in blocks; it must be positioned at the start.
+        
         TODO: Add support for more file types:
         - PDF: PyPDF2 or pdfplumber
         - DOCX: python-docx
@@ -180,13 +269,14 @@ class IngestionService:
         
         For now: support plain text and basic PDF.
         """
-        logger.info(f"Ingesting file {filename} for chatbox {chatbox_id}")
+        logger.info("Ingesting file %s for chatbox %s", filename, chatbox_id)
         
         # Extract text based on file type
         text = ""
         
         if mime_type == "text/plain" or filename.endswith(".txt"):
-            text = content.decode("utf-8", errors="ignore")
+            # Large uploads are spooled to disk; read and decode in a thread
+            text = await asyncio.to_thread(self._read_text, file)
         
         elif mime_type == "application/pdf" or filename.endswith(".pdf"):
             # TODO: Implement PDF extraction using PyPDF2 or pdfplumber
@@ -206,32 +296,196 @@ class IngestionService:
             source_type=DocumentType.FILE,
             source_name=filename,
             raw_content=text,
-            file_size_bytes=len(content),
+            file_size_bytes=file_size,
             mime_type=mime_type,
         )
-        document = await self.document_repo.create(document)
+        document = await DocumentRepository(session).create(document)
         
-        # Chunk and embed
-        chunks_text = self.chunking_service.chunk_text(text)
+        # Chunk, embed and store
+        chunks_created = await self._store_chunks(session, document, text)
         
-        if not chunks_text:
+        if not chunks_created:
             logger.warning("No chunks created from file")
             return document, 0
         
-        embeddings = await self.embedding_service.embed_texts(chunks_text)
+        logger.info("Created document %s from file with %s chunks", document.id, chunks_created)
+        return document, chunks_created
+    
+    async def _store_chunks(
+        self,
+        session: AsyncSession,
+        document: Document,
+        text: str,
+    ) -> int:
+        """
+        Chunk, embed and store one document's text.
         
-        chunks = []
-        for i, (chunk_text, embedding) in enumerate(zip(chunks_text, embeddings)):
-            chunk = Chunk(
-                document_id=document.id,
-                chatbox_id=chatbox_id,
-                content=chunk_text,
-                chunk_index=i,
-                embedding=embedding,
+        Chunks stream through in windows: while one window is embedded, the
+        previous one is written by COPY, so memory stays bounded by the
+        window size and API and database time overlap. All windows are
+        committed together.
+        
+        Documents that may exceed the batch threshold are chunked in full
+        instead, since the Batch API takes all of their text in one job; if
+        it is used, the chunks are stored without embeddings and the
+        document is PENDING (the commit also persists that status).
+        
+        Returns: number of chunks created
+        """
+        chatbox_id = document.chatbox_id
+        chunk_repo = ChunkRepository(session)
+        
+        if self._use_batch_api(self.chunking_service.max_chunks(text)):
+            chunks_text = self.chunking_service.chunk_text(text)
+            hashes, embeddings = await self._embed_chunks(
+                session, chatbox_id, chunks_text, document=document
+            )
+            rows = self._chunk_rows(document, 0, chunks_text, hashes, embeddings)
+            return await chunk_repo.copy_many(rows)
+        
+        chunks = self.chunking_service.iter_chunks(text)
+        chunks_created = 0
+        pending_rows: list[dict] = []
+        # Embeddings of the previous window, which is not stored yet, so
+        # repeats across a window boundary are still embedded only once
+        recent: dict = {}
+        
+        while window := list(islice(chunks, INGEST_WINDOW_CHUNKS)):
+            hashes, missing = await self._find_missing(chunk_repo, chatbox_id, window, recent)
+            embed_task = asyncio.create_task(self._embed_missing(missing)) if missing else None
+            
+            try:
+                await chunk_repo.copy_many(pending_rows, commit=False)
+            except BaseException:
+                if embed_task:
+                    embed_task.cancel()
+                raise
+            
+            if embed_task:
+                recent.update(await embed_task)
+            embeddings = [recent[content_hash] for content_hash in hashes]
+            pending_rows = self._chunk_rows(document, chunks_created, window, hashes, embeddings)
+            recent = dict(zip(hashes, embeddings))
+            chunks_created += len(window)
+        
+        await chunk_repo.copy_many(pending_rows, commit=False)
+        await session.commit()
+        return chunks_created
+    
+    @staticmethod
+    def _chunk_rows(
+        document: Document,
+        first_index: int,
+        chunks_text: list[str],
+        hashes: list[bytes],
+        embeddings: list,
+    ) -> list[dict]:
+        """Build chunk column dicts for a run of one document's chunks."""
+        return [
+            {
+                "document_id": document.id,
+                "chatbox_id": document.chatbox_id,
+                "content": chunk_text,
+                "chunk_index": i,
+                "content_sha256": content_hash,
+                "embedding": embedding,
+            }
+            for i, chunk_text, content_hash, embedding
+            in zip(count(first_index), chunks_text, hashes, embeddings)
+        ]
+    
+    async def _embed_chunks(
+        self,
+        session: AsyncSession,
+        chatbox_id: int,
+        chunks_text: list[str],
+        document: Optional[Document] = None,
+    ) -> tuple[list[bytes], list]:
+        """
+        Embed chunk texts, reusing stored vectors for content seen before.
+        
+        Chunks are keyed by SHA-256 of their text. Embeddings already stored
+        in this chatbox are reused, and repeated chunks within the batch are
+        embedded once, so only novel text reaches the embedding API.
+        
+        When a document is given and its novel text exceeds the batch
+        threshold, that text is submitted to the Batch API instead: the
+        document is marked PENDING and those embeddings are returned as None
+        for EmbeddingBatchPoller to fill in.
+        
+        Returns: (content hashes, embeddings), both in input order
+        """
+        embeddings: dict = {}
+        hashes, missing = await self._find_missing(
+            ChunkRepository(session), chatbox_id, chunks_text, embeddings
+        )
+        
+        if missing and document is not None and self._use_batch_api(len(missing)):
+            document.embedding_batch_id = await self.embedding_service.submit_batch(
+                {content_hash.hex(): text for content_hash, text in missing.items()}
             )
-            chunks.append(chunk)
+            document.status = DocumentStatus.PENDING
+            logger.info(
+                "Deferred %s chunks of document %s to batch %s",
+                len(missing), document.id, document.embedding_batch_id,
+            )
+        elif missing:
+            embeddings.update(await self._embed_missing(missing))
+        
+        return hashes, [embeddings.get(content_hash) for content_hash in hashes]
+    
+    async def _find_missing(
+        self,
+        chunk_repo: ChunkRepository,
+        chatbox_id: int,
+        chunks_text: list[str],
+        known: dict,
+    ) -> tuple[list[bytes], dict[bytes, str]]:
+        """
+        Hash chunk texts and find the ones with no embedding yet.
+        
+        The hash covers the embedding model along with the text, so vectors
+        from another model (or dev-mode stubs) are never reused. known maps
+        hashes to embeddings already at hand; it is extended in place with
+        those stored in this chatbox.
+        
+        Returns: (content hashes in input order, unique hash -> text to embed)
+        """
+        prefix = f"{self.embedding_service.model_key}\0".encode("utf-8")
+        hashes = [hashlib.sha256(prefix + text.encode("utf-8")).digest() for text in chunks_text]
+        known.update(
+            await chunk_repo.get_embeddings_by_hashes(chatbox_id, set(hashes) - known.keys())
+        )
         
-        await self.chunk_repo.create_many(chunks)
+        missing: dict[bytes, str] = {}
+        for content_hash, text in zip(hashes, chunks_text):
+            if content_hash not in known:
+                missing.setdefault(content_hash, text)
         
-        logger.info(f"Created document {document.id} from file with {len(chunks)} chunks")
-        return document, len(chunks)
+        logger.debug(
+            "Embedding %s of %s chunks (rest reused)", len(missing), len(chunks_text)
+        )
+        return hashes, missing
+    
+    async def _embed_missing(self, missing: dict[bytes, str]) -> dict:
+        """Embed texts keyed by hash, returning hash -> embedding."""
+        embeddings = await self.embedding_service.embed_texts(list(missing.values()))
+        # Cast the float32 matrix once to the column's storage format (FP16
+        # for halfvec), so the COPY codec sends each row's buffer as is
+        embeddings = embeddings.astype(EMBEDDING_DTYPE, copy=False)
+        return dict(zip(missing.keys(), embeddings))
+    
+    def _use_batch_api(self, count: int) -> bool:
+        """Whether this many novel chunks should go through the Batch API."""
+        threshold = settings.embedding_batch_threshold
+        return 0 < threshold < count and self.embedding_service.supports_batch_api
+    
+    @staticmethod
+    def _read_text(file: BinaryIO, block_size: int = 64 * 1024) -> str:
+        """Decode a UTF-8 file block by block, dropping undecodable bytes."""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        parts = []
+        while block := file.read(block_size):
+            parts.append(decoder.decode(block))
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
@@ -2,6 +2,11 @@
 
 from typing import Optional
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
 from app.core.config import settings
 from app.core.exceptions import ExternalServiceError
 from app.core.logging_config import get_logger
@@ -9,6 +14,11 @@ from app.core.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Chat completions can take tens of seconds; many run concurrently per process
+LLM_TIMEOUT_SECONDS = 60.0
+LLM_MAX_CONNECTIONS = 200
+LLM_MAX_KEEPALIVE_CONNECTIONS = 50
+
 
 class LLMService:
     """
@@ -18,6 +28,13 @@ class LLMService:
     Falls back to stub answers in dev mode.
     """
     
+    SYSTEM_PROMPT = (
+        "You are a helpful assistant that answers questions based on the provided context. "
+        "If the answer is not in the context, say so. "
+        "Always cite your sources by reference number [1], [2], etc."
+    )
+    SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+    
     def __init__(self):
         self.openai_client: Optional[any] = None
         
@@ -25,15 +42,49 @@ class LLMService:
         if settings.openai_api_key:
             try:
                 from openai import AsyncOpenAI
-                self.openai_client = AsyncOpenAI(api_key=settings.openai_api_key)
+                self.openai_client = AsyncOpenAI(
+                    api_key=settings.openai_api_key,
+                    http_client=self._build_http_client(),
+                    timeout=LLM_TIMEOUT_SECONDS,
+                )
                 logger.info("OpenAI LLM initialized")
             except ImportError:
                 logger.warning("openai package not installed. Using stub LLM responses.")
             except Exception as e:
-                logger.warning(f"Failed to initialize OpenAI client: {e}. Using stub LLM responses.")
+                logger.warning("Failed to initialize OpenAI client: %s. Using stub LLM responses.", e)
         else:
             logger.info("OpenAI API key not configured. Using stub LLM responses in dev mode.")
     
+    @staticmethod
+    def _build_http_client() -> Optional[any]:
+        """
+        Pooled HTTP/2 client for the SDK, or None for its default.
+        
+        Concurrent queries multiplex over a few kept-alive connections
+        instead of each opening its own TLS connection. Without the h2
+        package the pool falls back to HTTP/1.1.
+        """
+        if httpx is None:
+            return None
+        options = {
+            "timeout": LLM_TIMEOUT_SECONDS,
+            "limits": httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        }
+        try:
+            return httpx.AsyncClient(http2=True, **options)
+        except ImportError:
+            # Must not reach __init__'s handler, which means openai is missing
+            logger.warning("h2 package not installed. LLM client will use HTTP/1.1.")
+            return httpx.AsyncClient(**options)
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP connections."""
+        if self.openai_client:
+            await self.openai_client.close()
+    
     async def generate_answer(
         self,
         question: str,
@@ -45,45 +96,36 @@ class LLMService:
         
         Uses OpenAI if configured, otherwise returns stub answer.
         """
-        # Use OpenAI if available
-        if self.openai_client:
-            try:
-                # Build context from chunks
-                context = "\n\n".join([f"[{i+1}] {chunk}" for i, chunk in enumerate(context_chunks)])
-                
-                # Create prompt
-                system_prompt = (
-                    "You are a helpful assistant that answers questions based on the provided context. "
-                    "If the answer is not in the context, say so. "
-                    "Always cite your sources by reference number [1], [2], etc."
-                )
-                
-                user_prompt = f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
-                
-                # Call OpenAI
-                response = await self.openai_client.chat.completions.create(
-                    model=settings.openai_chat_model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    max_tokens=max_tokens,
-                    temperature=0.7,
-                )
-                
-                answer = response.choices[0].message.content.strip()
-                return answer
-                
-            except Exception as e:
-                logger.error(f"OpenAI LLM failed: {e}")
-                raise ExternalServiceError(
-                    f"Failed to generate answer: {str(e)}",
-                    service="openai"
-                )
-        
         # Fallback: Generate stub answer (for dev mode)
-        logger.debug("Using stub LLM response (dev mode)")
-        return self._generate_stub_answer(question, context_chunks)
+        if not self.openai_client:
+            logger.debug("Using stub LLM response (dev mode)")
+            return self._generate_stub_answer(question, context_chunks)
+        
+        try:
+            # Build context from chunks
+            context = "\n\n".join([f"[{i+1}] {chunk}" for i, chunk in enumerate(context_chunks)])
+            user_prompt = f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+            
+            # Call OpenAI
+            response = await self.openai_client.chat.completions.create(
+                model=settings.openai_chat_model,
+                messages=[
+                    self.SYSTEM_MESSAGE,
+                    {"role": "user", "content": user_prompt},
+                ],
+                max_tokens=max_tokens,
+                temperature=0.7,
+            )
+            
+            answer = response.choices[0].message.content.strip()
+            return answer
+            
+        except Exception as e:
+            logger.error("OpenAI LLM failed: %s", e)
+            raise ExternalServiceError(
+                f"Failed to generate answer: {str(e)}",
+                service="openai"
+            )
     
     def _generate_stub_answer(self, question: str, context_chunks: list[str]) -> str:
         """Generate a stub answer for dev mode."""
@@ -1,12 +1,16 @@
 """Query service for RAG (Retrieval-Augmented Generation)."""
 
+import asyncio
+import hashlib
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.chatbox import Chatbox
+from app.models.chatbox import Chatbox, normalize_origin
 from app.repositories.chunk_repository import ChunkRepository
 from app.repositories.document_repository import DocumentRepository
 from app.services.embedding_service import EmbeddingService
 from app.services.llm_service import LLMService
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.exceptions import ForbiddenError, OriginNotAllowedError
 from app.core.logging_config import get_logger
@@ -15,6 +19,13 @@ from app.schemas.query import SourceChunk
 
 logger = get_logger(__name__)
 
+# Marks a cache miss, since a document's source_name may itself be None
+_MISSING = object()
+
+
+class _LeaderCancelled(Exception):
+    """The request running a coalesced query was cancelled before finishing."""
+
 
 class QueryService:
     """
@@ -23,19 +34,26 @@ class QueryService:
     2. Embed query
     3. Retrieve relevant chunks
     4. Generate answer with LLM
+    
+    Built once at startup; the per-request database session is passed
+    to each call.
     """
     
     def __init__(
         self,
-        chunk_repo: ChunkRepository,
-        document_repo: DocumentRepository,
         embedding_service: EmbeddingService,
         llm_service: LLMService,
     ):
-        self.chunk_repo = chunk_repo
-        self.document_repo = document_repo
         self.embedding_service = embedding_service
         self.llm_service = llm_service
+        # Document id -> source_name; documents are never renamed, so the TTL
+        # only bounds how long a deleted document's name can linger
+        self._source_names = TTLCache(settings.document_cache_seconds, max_entries=10_000)
+        # Answers keyed by chatbox, question and retrieved chunks; chunk rows
+        # are immutable, so an entry is valid until the prompt could change
+        self._answers = TTLCache(settings.answer_cache_seconds, max_entries=10_000)
+        # Identical queries in flight, each waiting on the first one's result
+        self._inflight: dict[tuple, asyncio.Future] = {}
     
     def validate_origin(self, chatbox: Chatbox, origin: Optional[str]) -> None:
         """
@@ -57,17 +75,15 @@ class QueryService:
         if not chatbox.allowed_domains:
             raise ForbiddenError("No allowed domains configured for this chatbox")
         
-        # Normalize origin and allowed domains
-        origin_normalized = origin.lower().rstrip("/")
-        allowed_normalized = [d.lower().rstrip("/") for d in chatbox.allowed_domains]
-        
-        if origin_normalized not in allowed_normalized:
+        # Normalize origin; allowed domains are normalized once per domain list
+        if normalize_origin(origin) not in chatbox.allowed_normalized:
             raise OriginNotAllowedError(origin)
         
-        logger.debug(f"Origin {origin} validated for chatbox {chatbox.id}")
+        logger.debug("Origin %s validated for chatbox %s", origin, chatbox.id)
     
     async def query(
         self,
+        session: AsyncSession,
         chatbox: Chatbox,
         question: str,
         origin: Optional[str] = None,
@@ -78,9 +94,13 @@ class QueryService:
         """
         Process a query with RAG.
         
+        Concurrent identical queries (same chatbox, question and search
+        parameters) are coalesced: each caller's origin is validated, then
+        all of them share the first caller's embedding, search and LLM call.
+        
         Returns: (answer, source_chunks)
         """
-        logger.info(f"Processing query for chatbox {chatbox.id}: {question[:50]}...")
+        logger.info("Processing query for chatbox %s: %s...", chatbox.id, question[:50])
         
         # Validate origin
         self.validate_origin(chatbox, origin)
@@ -89,55 +109,133 @@ class QueryService:
         top_k = top_k or settings.vector_top_k_default
         min_score = min_score or settings.vector_min_score_default
         
-        # Embed query
-        query_embedding = await self.embedding_service.embed_text(question)
+        key = (chatbox.id, question, document_id, top_k, min_score)
+        while (inflight := self._inflight.get(key)) is not None:
+            try:
+                # Shielded: this caller going away must not cancel the others
+                return await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                # The leading request was dropped; take over or join whoever did
+                continue
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._answer(session, chatbox, question, document_id, top_k, min_score)
+        except BaseException as e:
+            # Waiters get the same error; if this request was cancelled they
+            # are told to run the query themselves instead
+            future.set_exception(
+                _LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e
+            )
+            future.exception()  # marks it retrieved even if nobody was waiting
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+    
+    async def _answer(
+        self,
+        session: AsyncSession,
+        chatbox: Chatbox,
+        question: str,
+        document_id: Optional[int],
+        top_k: int,
+        min_score: float,
+    ) -> tuple[str, list[SourceChunk]]:
+        """Embed, search and generate the answer for one validated query."""
+        # Embed query while the search settings round-trip runs; origin is
+        # validated first so rejected requests never reach the embedding API
+        embedding_task = asyncio.create_task(self.embedding_service.embed_text(question))
+        chunk_repo = ChunkRepository(session)
+        try:
+            await chunk_repo.configure_search(top_k)
+            query_embedding = await embedding_task
+        finally:
+            # On cancellation or an early error, don't leave the embedding
+            # running or its exception unretrieved
+            if not embedding_task.done():
+                embedding_task.cancel()
+            elif not embedding_task.cancelled():
+                embedding_task.exception()
         
         # Retrieve relevant chunks
-        chunks_with_scores = await self.chunk_repo.similarity_search(
+        hits = await chunk_repo.similarity_search(
             chatbox_id=chatbox.id,
             query_embedding=query_embedding,
             top_k=top_k,
             min_score=min_score,
             document_id=document_id,
+            configure=False,
         )
         
-        if not chunks_with_scores:
+        if not hits:
             logger.info("No relevant chunks found")
             answer = "I couldn't find any relevant information to answer your question."
             return answer, []
         
-        # Extract chunks and build context
-        chunks = [chunk for chunk, score in chunks_with_scores]
-        scores = [score for chunk, score in chunks_with_scores]
-        context_texts = [chunk.content for chunk in chunks]
-        
-        # Generate answer with LLM
-        answer = await self.llm_service.generate_answer(
-            question=question,
-            context_chunks=context_texts,
-        )
+        # Generate answer with LLM, unless this exact prompt was answered recently
+        answer_key = self._answer_key(chatbox.id, question, hits)
+        answer = self._answers.get(answer_key)
+        if answer is None:
+            answer = await self.llm_service.generate_answer(
+                question=question,
+                context_chunks=[hit.content for hit in hits],
+            )
+            self._answers.set(answer_key, answer)
+        else:
+            logger.debug("Answer cache hit for chatbox %s", chatbox.id)
         
         # Build source chunks response
-        # Get document metadata for sources
-        doc_ids = list(set(chunk.document_id for chunk in chunks))
-        documents = {}
-        for doc_id in doc_ids:
-            doc = await self.document_repo.get_by_id_optional(doc_id)
-            if doc:
-                documents[doc_id] = doc
-        
-        source_chunks = []
-        for chunk, score in zip(chunks, scores):
-            doc = documents.get(chunk.document_id)
-            source_chunks.append(
-                SourceChunk(
-                    document_id=chunk.document_id,
-                    chunk_id=chunk.id,
-                    content=chunk.content,
-                    score=score,
-                    source_name=doc.source_name if doc else None,
-                )
+        source_names = await self._get_source_names(
+            session, {hit.document_id for hit in hits}
+        )
+        source_chunks = [
+            SourceChunk(
+                document_id=hit.document_id,
+                chunk_id=hit.id,
+                content=hit.content,
+                score=hit.score,
+                source_name=source_names.get(hit.document_id),
             )
+            for hit in hits
+        ]
         
-        logger.info(f"Generated answer with {len(source_chunks)} sources")
+        logger.info("Generated answer with %s sources", len(source_chunks))
         return answer, source_chunks
+    
+    @staticmethod
+    def _answer_key(chatbox_id: int, question: str, hits: list) -> bytes:
+        """
+        Digest identifying an LLM prompt: chatbox, question and chunk ids.
+        
+        Ids keep their ranked order, since that is the order of the context.
+        """
+        chunk_ids = ",".join(str(hit.id) for hit in hits)
+        data = f"{chatbox_id}|{chunk_ids}|{question}".encode("utf-8", "surrogatepass")
+        return hashlib.blake2b(data, digest_size=16).digest()
+    
+    async def _get_source_names(
+        self,
+        session: AsyncSession,
+        document_ids: set[int],
+    ) -> dict[int, Optional[str]]:
+        """Map document ids to source names, querying only uncached ones."""
+        source_names = {}
+        misses = []
+        for document_id in document_ids:
+            source_name = self._source_names.get(document_id, _MISSING)
+            if source_name is _MISSING:
+                misses.append(document_id)
+            else:
+                source_names[document_id] = source_name
+        
+        if misses:
+            documents = await DocumentRepository(session).get_by_ids(misses)
+            for document_id, document in documents.items():
+                self._source_names.set(document_id, document.source_name)
+                source_names[document_id] = document.source_name
+        
+        return source_names
@@ -10,16 +10,16 @@ import json
 BASE_URL = "http://localhost:8000"
 API_KEY = "dev-api-key-12345"  # Match the key from init_db.py or your .env
 
-headers = {
-    "X-API-Key": API_KEY,
-    "Content-Type": "application/json",
-}
+# One pooled session, so every call reuses the same keep-alive connection
+# (json= sets the Content-Type header per request)
+session = requests.Session()
+session.headers.update({"X-API-Key": API_KEY})
 
 
 def test_health():
     """Test health endpoint."""
     print("\n1. Testing health endpoint...")
-    response = requests.get(f"{BASE_URL}/health")
+    response = session.get(f"{BASE_URL}/health")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}")
     return response.status_code == 200
@@ -34,9 +34,8 @@ def test_create_chatbox():
         "allowed_domains": ["https://example.com"],
         "enforce_allowed_domains": False,
     }
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/v1/chatboxes",
-        headers=headers,
         json=data,
     )
     print(f"Status: {response.status_code}")
@@ -50,7 +49,7 @@ def test_create_chatbox():
 def test_list_chatboxes():
     """Test listing chatboxes."""
     print("\n3. Testing chatbox listing...")
-    response = requests.get(f"{BASE_URL}/v1/chatboxes", headers=headers)
+    response = session.get(f"{BASE_URL}/v1/chatboxes")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}")
     return response.status_code == 200
@@ -65,9 +64,8 @@ def test_ingest_text(chatbox_id):
                 "It's based on standard Python type hints and provides automatic API documentation.",
         "source_name": "FastAPI Introduction",
     }
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/v1/ingest/text",
-        headers=headers,
         json=data,
     )
     print(f"Status: {response.status_code}")
@@ -83,9 +81,8 @@ def test_query(chatbox_id):
         "question": "What is FastAPI?",
         "origin": "https://example.com",
     }
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/v1/query",
-        headers=headers,
         json=data,
     )
     print(f"Status: {response.status_code}")
@@ -101,11 +101,18 @@ except ImportError:
     print("  ℹ OpenAI: Not installed (will use stubs)")
 
 try:
-    import pgvector
-    print(f"  ✓ pgvector: {pgvector.__version__}")
+    import pgvector  # noqa: F401  (has no __version__ attribute)
+    from importlib.metadata import version
+    print(f"  ✓ pgvector: {version('pgvector')}")
 except ImportError:
     print("  ℹ pgvector: Not installed (needed for vector search)")
 
+try:
+    import uvloop
+    print(f"  ✓ uvloop: {uvloop.__version__} (used by uvicorn)")
+except ImportError:
+    print("  ℹ uvloop: Not installed (uvicorn uses the asyncio event loop)")
+
 # Check 9: Configuration warnings
 print("\n⚙️  Configuration:")
 if not settings.database_url: